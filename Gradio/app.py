@@ -1,78 +1,848 @@
 import os
+import asyncio
+import base64
+import csv
+import hashlib
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import openai
 import gradio as gr
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from io import BytesIO
 from PIL import Image
-import requests
-
-# Import API key from config file
-# Priority: config.py > environment variable
-try:
-    from config import OPENAI_API_KEY
-except ImportError:
-    # Fallback to environment variable if config.py doesn't exist
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-
-# Validate API key exists
-if not OPENAI_API_KEY:
-    raise ValueError(
-        "OpenAI API key not found! Please set it in config.py or OPENAI_API_KEY environment variable.\n"
-        "Copy config.example.py to config.py and add your API key."
-    )
-
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
-
-def generate_image(prompt):
+
+# Image generation settings
+IMAGE_MODEL = "dall-e-3"
+IMAGE_SIZE = "1024x1024"  # DALL-E 3 supports: "1024x1024", "1792x1024", "1024x1792"
+IMAGE_QUALITY = "standard"  # "standard" or "hd"
+# "b64_json" gets the image inside the API response; "url" needs a second download
+RESPONSE_FORMAT = "b64_json"
+
+# URL mode downloads reuse pooled keep-alive connections
+DOWNLOAD_TIMEOUT = httpx.Timeout(30, connect=5)  # Seconds between bytes received, and to connect
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_POOL_SIZE = 10
+
+# Concurrency: requests Gradio runs at once, and image API calls allowed in flight
+QUEUE_CONCURRENCY = 20
+QUEUE_MAX_SIZE = 100  # Further requests are turned away until the queue drains
+MAX_IN_FLIGHT_REQUESTS = 10
+
+# Image API pacing: a token bucket, retuned from the rate-limit headers the API sends
+API_CALLS_PER_MINUTE = 5
+API_BURST = 5  # Calls allowed back to back after a quiet spell
+# Retries for rate limits, timeouts and server errors: jittered exponential backoff
+RETRY_LIMIT = 5
+RETRY_BASE_DELAY = 1  # Seconds before the first retry, doubling each time
+RETRY_MAX_DELAY = 60
+
+# Metrics: recent timings kept per stage for the percentiles, served at /metrics
+METRICS_WINDOW = 1000
+METRICS_QUANTILES = (0.5, 0.95, 0.99)
+# Address to serve on; the same variables demo.launch() reads
+SERVER_NAME = os.getenv("GRADIO_SERVER_NAME", "127.0.0.1")
+SERVER_PORT = int(os.getenv("GRADIO_SERVER_PORT", "7860"))
+
+# Batch tab: prompts per batch, images generated at once, and retries shared by the batch
+BATCH_MAX_PROMPTS = 100
+BATCH_CONCURRENCY = 8
+BATCH_RETRY_BUDGET = 10
+
+# Image backend: "openai", or "mock" for the local stand-in server in mock_server.py
+# (for trying the app and load testing without an API key or any cost)
+IMAGE_BACKEND = os.getenv("IMAGE_BACKEND", "openai")
+MOCK_SERVER_URL = os.getenv("MOCK_SERVER_URL", "http://127.0.0.1:8001/v1")
+
+# Generated images are cached on disk (least recently used evicted first),
+# with the most recent ones also kept decoded in memory
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "image_cache" if IMAGE_BACKEND == "openai" else f"image_cache-{IMAGE_BACKEND}")
+CACHE_MAX_BYTES = 500 * 1024 * 1024
+MEMORY_CACHE_ITEMS = 16
+
+# Delivery to the browser: a small compressed preview is shown first,
+# the full-resolution PNG is downloaded only when asked for
+DELIVERY_FORMAT = "WEBP"  # "WEBP" or "JPEG"
+DELIVERY_QUALITY = 80  # 1-100; lower is smaller and blurrier
+PREVIEW_SIZE = 512  # Longest side of the preview, in pixels
+ENCODE_WORKERS = 4
+DELIVERY_DIR = os.path.join(tempfile.gettempdir(), "dalle-previews")
+DELIVERY_MAX_BYTES = 200 * 1024 * 1024  # Oldest files are deleted past this
+
+
+def openai_backend():
+    """The real image API"""
+    # Import API key from config file
+    # Priority: config.py > environment variable
+    try:
+        from config import OPENAI_API_KEY
+    except ImportError:
+        # Fallback to environment variable if config.py doesn't exist
+        OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+
+    # Validate API key exists
+    if not OPENAI_API_KEY:
+        raise ValueError(
+            "OpenAI API key not found! Please set it in config.py or OPENAI_API_KEY environment variable.\n"
+            "Copy config.example.py to config.py and add your API key.\n"
+            "(Or set IMAGE_BACKEND=mock to try the app against mock_server.py.)"
+        )
+    return openai.AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+
+def mock_backend():
+    """The local stand-in server, which speaks the same images API"""
+    return openai.AsyncOpenAI(api_key="mock", base_url=MOCK_SERVER_URL, max_retries=0)
+
+
+# Each backend returns an async client with the OpenAI images API; add new ones here
+BACKENDS = {
+    "openai": openai_backend,
+    "mock": mock_backend,
+}
+
+if IMAGE_BACKEND not in BACKENDS:
+    raise ValueError(f"Unknown IMAGE_BACKEND '{IMAGE_BACKEND}', expected one of: {', '.join(BACKENDS)}")
+
+# Initialize the client (async, so waiting on the API doesn't hold a worker).
+# Retries are left to the scheduler below, which knows about every user's calls.
+client = BACKENDS[IMAGE_BACKEND]()
+
+# Shared HTTP client for image downloads, so connections (and TLS) are reused
+http = httpx.AsyncClient(
+    timeout=DOWNLOAD_TIMEOUT,
+    limits=httpx.Limits(max_connections=DOWNLOAD_POOL_SIZE, max_keepalive_connections=DOWNLOAD_POOL_SIZE)
+)
+
+
+class Metrics:
+    """Counters and per-stage timings, served in the Prometheus text format"""
+
+    def __init__(self, window):
+        self.window = window
+        self.counters = OrderedDict()  # (name, labels) -> count
+        self.timings = OrderedDict()  # stage -> recent durations in seconds
+        self.totals = {}  # stage -> [count, total seconds] since startup
+        self.lock = threading.Lock()
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.timings.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+            totals = self.totals.setdefault(stage, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the code in a with block as one stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def render(self):
+        lines = [
+            "# HELP image_stage_seconds Time spent in each stage of serving an image",
+            "# TYPE image_stage_seconds summary",
+        ]
+        with self.lock:
+            for stage, durations in self.timings.items():
+                ordered = sorted(durations)
+                for quantile in METRICS_QUANTILES:
+                    value = ordered[min(len(ordered) - 1, int(len(ordered) * quantile))]
+                    lines.append(f'image_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+                count, total = self.totals[stage]
+                lines.append(f'image_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+                lines.append(f'image_stage_seconds_count{{stage="{stage}"}} {count}')
+
+            typed = set()
+            for (name, labels), value in self.counters.items():
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} counter")
+                label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(METRICS_WINDOW)
+
+
+class ImageCache:
+    """
+    Two-tier cache of generated images, keyed on everything that affects the result.
+    Files on disk are named by a hash of the key; their modification time records
+    when they were last used, so the oldest are evicted once the size limit is hit.
+    """
+
+    def __init__(self, directory, max_bytes, memory_items):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.memory = OrderedDict()  # key -> PIL image, most recently used last
+        self.lock = threading.Lock()  # Used from several worker threads at once
+
+        # Disk index: file name -> size, least recently used first
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".png"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        self.files = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.total_bytes = sum(self.files.values())
+
+    @staticmethod
+    def key(model, prompt, size, quality):
+        return hashlib.sha256(json.dumps([model, prompt, size, quality]).encode()).hexdigest()
+
+    def get(self, key, count=True):
+        """Cached image for a key, or None (count=False leaves it out of the hit and miss counts)"""
+        name = key + ".png"
+        with self.lock:
+            image = self.memory.get(key)
+            if image is not None:
+                self.memory.move_to_end(key)
+                if count:
+                    metrics.count("image_cache_hits_total", tier="memory")
+                return image
+            if name not in self.files:
+                if count:
+                    metrics.count("image_cache_misses_total")
+                return None
+
+        # Reading and decoding happen outside the lock so other lookups aren't held up
+        path = os.path.join(self.directory, name)
+        try:
+            os.utime(path)  # Mark as recently used
+            image = Image.open(path)
+            image.load()
+        except OSError:
+            # Removed or damaged behind our back; drop it from the index
+            with self.lock:
+                self.total_bytes -= self.files.pop(name, 0)
+            if count:
+                metrics.count("image_cache_misses_total")
+            return None
+        with self.lock:
+            if name in self.files:
+                self.files.move_to_end(name)
+            self.remember(key, image)
+        if count:
+            metrics.count("image_cache_hits_total", tier="disk")
+        return image
+
+    def put(self, key, data):
+        """Store an image's encoded bytes and return it decoded"""
+        image = Image.open(BytesIO(data))
+        image.load()
+
+        # Write to a temporary file first so readers never see half an image
+        name = key + ".png"
+        path = os.path.join(self.directory, name)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        with self.lock:
+            self.total_bytes += len(data) - self.files.pop(name, 0)
+            self.files[name] = len(data)
+            evicted = self.evict()
+            self.remember(key, image)
+        self.remove(evicted)
+        return image
+
+    def path(self, key):
+        """File holding a cached image's original bytes, or None if it isn't on disk"""
+        with self.lock:
+            name = key + ".png"
+            return os.path.join(self.directory, name) if name in self.files else None
+
+    def remember(self, key, image):
+        self.memory[key] = image
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def evict(self):
+        """Drop the least recently used files from the index until the cache fits its limit; returns their names"""
+        evicted = []
+        while self.total_bytes > self.max_bytes and len(self.files) > 1:
+            name, size = self.files.popitem(last=False)
+            self.total_bytes -= size
+            evicted.append(name)
+        return evicted
+
+    def remove(self, names):
+        """Delete evicted files (called without the lock held)"""
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+image_cache = ImageCache(CACHE_DIR, CACHE_MAX_BYTES, MEMORY_CACHE_ITEMS)
+
+
+class DeliveryFolder:
+    """
+    Files handed to Gradio to serve (previews and copies of originals), kept
+    under a size limit by deleting the least recently written first.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+        # File name -> size, oldest first
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        self.files = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.total_bytes = sum(self.files.values())
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def __contains__(self, name):
+        with self.lock:
+            return name in self.files and os.path.exists(self.path(name))
+
+    def add(self, name, temp_path):
+        """Move a finished file into the folder under its name, then trim the folder; returns its path"""
+        path = self.path(name)
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+
+        evicted = []
+        with self.lock:
+            self.total_bytes += size - self.files.pop(name, 0)
+            self.files[name] = size
+            while self.total_bytes > self.max_bytes and len(self.files) > 1:
+                old_name, old_size = self.files.popitem(last=False)
+                self.total_bytes -= old_size
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                os.remove(self.path(old_name))
+            except FileNotFoundError:
+                pass
+        return path
+
+
+deliveries = DeliveryFolder(DELIVERY_DIR, DELIVERY_MAX_BYTES)
+
+# Image encoding is CPU work; a pool keeps it off the event loop
+encode_pool = ThreadPoolExecutor(ENCODE_WORKERS, thread_name_prefix="encode")
+
+
+class SingleFlight:
+    """
+    Lets concurrent identical requests share one in-flight generation.
+    The first request for a key starts the work; the rest wait for its result.
+    """
+
+    def __init__(self):
+        self.calls = {}  # key -> [task, number of requests waiting on it]
+        self.requests = 0
+        self.coalesced = 0
+
+    async def run(self, key, start):
+        """Await the result of start() for this key, joining a running call if there is one"""
+        self.requests += 1
+        call = self.calls.get(key)
+        if call:
+            self.coalesced += 1
+            call[1] += 1
+            metrics.count("coalesced_requests_total")
+        else:
+            call = [asyncio.ensure_future(start()), 1]
+            self.calls[key] = call
+            call[0].add_done_callback(lambda task: self.finished(key))
+        # Shielded, so one user giving up doesn't cancel it for everyone else
+        return await asyncio.shield(call[0])
+
+    def finished(self, key):
+        _, waiting = self.calls.pop(key)
+        if waiting > 1:
+            print(f"Shared one generation between {waiting} requests "
+                  f"(coalescing rate so far: {self.rate():.0%})")
+
+    def rate(self):
+        """Fraction of requests that joined another request's generation"""
+        return self.coalesced / self.requests if self.requests else 0
+
+
+generations = SingleFlight()
+
+
+# Failures that may succeed if the same call is made again later
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def retryable(error):
+    """Whether a failed call is worth making again (an account out of credit won't recover by waiting)"""
+    if isinstance(error, openai.RateLimitError) and error.code == "insufficient_quota":
+        return False
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def parse_duration(text):
+    """Seconds in a rate-limit reset header, such as 1s, 6m0s or 120ms"""
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * units[unit] for amount, unit in re.findall(r"([\d.]+)(ms|s|m|h)", text))
+
+
+class ImageScheduler:
+    """
+    Sends image API calls at the pace the account's rate limit allows.
+    Users take turns, so one big batch can't hold everyone else up, and calls
+    that fail with a rate limit, timeout or server error are retried with backoff.
+    """
+
+    def __init__(self, calls_per_minute, burst, max_in_flight):
+        self.rate = calls_per_minute / 60  # Tokens added per second
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0  # Set when the API says the limit is used up
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.queues = OrderedDict()  # user -> waiting calls; the first user goes next
+        self.wakeup = asyncio.Event()
+        self.dispatcher = None
+        self.running = set()  # Calls in progress; the event loop only keeps weak references to tasks
+
+    async def call(self, user, request):
+        """Run request() (which returns a raw API response) on this user's turn"""
+        if self.dispatcher is None:
+            self.dispatcher = asyncio.ensure_future(self.dispatch())
+            self.dispatcher.add_done_callback(self.dispatcher_stopped)
+        result = asyncio.get_running_loop().create_future()
+        self.enqueue(user, (request, result, 0))
+        return await result
+
+    def enqueue(self, user, job, retry=False):
+        queue = self.queues.setdefault(user, deque())
+        if retry:
+            queue.appendleft(job)  # A retried call keeps its place in the user's line
+        else:
+            queue.append(job)
+        self.wakeup.set()
+
+    async def dispatch(self):
+        """Start the next user's next call whenever a token and a slot are free"""
+        while True:
+            if not self.queues:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            await self.take_token()
+            await self.in_flight.acquire()
+
+            # Round robin: the user at the front goes, then moves to the back
+            job = None
+            while self.queues and job is None:
+                user, queue = next(iter(self.queues.items()))
+                job = queue.popleft()
+                if queue:
+                    self.queues.move_to_end(user)
+                else:
+                    del self.queues[user]
+                if job[1].done():
+                    job = None  # Nobody is waiting for it any more
+            if job is None:
+                self.in_flight.release()
+                continue
+            task = asyncio.ensure_future(self.run(user, job))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    def dispatcher_stopped(self, task):
+        """If dispatching failed, fail the waiting calls too; the next call starts a fresh dispatcher"""
+        self.dispatcher = None
+        error = None if task.cancelled() else task.exception()
+        if error is None:
+            return
+        print(f"Image scheduler stopped: {error!r}")
+        for queue in self.queues.values():
+            for _, result, _ in queue:
+                if not result.done():
+                    result.set_exception(error)
+        self.queues.clear()
+
+    async def take_token(self):
+        """Wait until the token bucket (and any pause from the API) allows a call"""
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            # Short naps, so a rate raised by the headers meanwhile takes effect
+            await asyncio.sleep(min(1, (1 - self.tokens) / self.rate))
+
+    async def run(self, user, job):
+        request, result, attempt = job
+        try:
+            response = await request()
+        except Exception as e:
+            if not retryable(e) or attempt >= RETRY_LIMIT:
+                if not result.done():
+                    result.set_exception(e)
+                return
+            delay = self.backoff(attempt, e)
+            if isinstance(e, openai.RateLimitError):
+                # Everyone waits, not just this call, or the next ones fail too
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            metrics.count("image_api_retries_total", error=type(e).__name__)
+            asyncio.get_running_loop().call_later(delay, self.enqueue, user,
+                                                  (request, result, attempt + 1), True)
+        else:
+            self.read_limits(response.headers)
+            if not result.done():  # The caller may have given up meanwhile
+                result.set_result(response.parse())
+        finally:
+            self.in_flight.release()
+
+    def backoff(self, attempt, error):
+        """Seconds before retrying: exponential with jitter, or what the API asked for"""
+        delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1)
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def read_limits(self, headers):
+        """Follow the account's real limits from the response headers"""
+        limit = headers.get("x-ratelimit-limit-requests", "")
+        if limit.isdigit() and int(limit) > 0:  # Anything else would stop the token bucket
+            self.rate = int(limit) / 60  # Image limits are per minute
+            self.burst = max(1, min(int(limit), API_BURST))
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        reset = headers.get("x-ratelimit-reset-requests")
+        if remaining == "0" and reset:
+            self.paused_until = max(self.paused_until, time.monotonic() + parse_duration(reset))
+
+
+scheduler = ImageScheduler(API_CALLS_PER_MINUTE, API_BURST, MAX_IN_FLIGHT_REQUESTS)
+
+async def download_image(url):
+    """Stream an image into memory over the shared client"""
+    async with http.stream("GET", url) as response:
+        response.raise_for_status()
+        return b"".join([chunk async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE)])
+
+
+async def generate_image(prompt, request: gr.Request = None):
     """
     Generates an image using OpenAI's DALL-E image generation API from the user's prompt.
-    Returns a PIL Image object for Gradio to display.
+    Returns a compressed preview for Gradio to display and the full-resolution PNG to download.
     """
     if not prompt or not prompt.strip():
-        return None
+        return None, None
     
     try:
-        # Call OpenAI Image API using DALL-E 3
-        response = client.images.generate(
-            model="dall-e-3",
-            prompt=prompt,
-            size="1024x1024",  # DALL-E 3 supports: "1024x1024", "1792x1024", "1024x1792"
-            quality="standard",  # "standard" or "hd"
-            n=1
-        )
-
-        # Get image URL from response
-        image_url = response.data[0].url
-        
-        # Download the image
-        img_response = requests.get(image_url)
-        img_response.raise_for_status()
-        
-        # Convert to PIL Image
-        image = Image.open(BytesIO(img_response.content))
-        
-        return image
+        with metrics.timer("total"):
+            cache_key = prompt_key(prompt)
+            image = await get_image(prompt, user_id(request))
+            return await deliver(image, cache_key)
         
     except openai.OpenAIError as e:
-        return f"OpenAI API Error: {str(e)}"
-    except requests.RequestException as e:
-        return f"Error downloading image: {str(e)}"
+        metrics.count("image_errors_total", stage="api")
+        raise gr.Error(f"OpenAI API Error: {str(e)}")
+    except httpx.HTTPError as e:
+        metrics.count("image_errors_total", stage="download")
+        raise gr.Error(f"Error downloading image: {str(e)}")
     except Exception as e:
-        return f"Error generating image: {str(e)}"
+        metrics.count("image_errors_total", stage="other")
+        raise gr.Error(f"Error generating image: {str(e)}")
+
+
+def user_id(request):
+    """Who a request is from, so the scheduler can take turns between users"""
+    return request.session_hash if request else "anonymous"
+
+
+def prompt_key(prompt):
+    """Cache key for a prompt with the current image settings"""
+    prompt = " ".join(prompt.split())  # Extra spaces don't change the image
+    return ImageCache.key(IMAGE_MODEL, prompt, IMAGE_SIZE, IMAGE_QUALITY)
+
+
+async def get_image(prompt, user="anonymous"):
+    """Image for a prompt, from the cache or a new generation (raises on failure)"""
+    prompt = " ".join(prompt.split())
+    
+    # Prompts that have been generated before come straight from the cache
+    # (disk reads and image decoding run in a thread, off the event loop)
+    cache_key = prompt_key(prompt)
+    with metrics.timer("cache_lookup"):
+        image = await asyncio.to_thread(image_cache.get, cache_key)
+    if image is not None:
+        return image
+    
+    # Users asking for the same image at the same time share one API call
+    return await generations.run(cache_key, lambda: generate_new_image(prompt, cache_key, user))
+
+
+async def generate_new_image(prompt, cache_key, user):
+    """Call the API for an image that isn't cached, then cache it"""
+    # A generation for the same prompt may have finished since get_image's lookup
+    # missed; checking again here means it is never paid for twice
+    image = await asyncio.to_thread(image_cache.get, cache_key, False)
+    if image is not None:
+        return image
+    
+    # Call OpenAI Image API using DALL-E 3 when the scheduler gives this user a turn
+    # (the raw response carries the rate-limit headers)
+    async def request():
+        with metrics.timer("api_call"):
+            return await client.images.with_raw_response.generate(
+                model=IMAGE_MODEL,
+                prompt=prompt,
+                size=IMAGE_SIZE,
+                quality=IMAGE_QUALITY,
+                response_format=RESPONSE_FORMAT,
+                n=1
+            )
+    
+    # Scheduled time includes waiting for a turn and any retries
+    with metrics.timer("api_scheduled"):
+        response = await scheduler.call(user, request)
+
+    # Get the image bytes from the response, or download them from its URL
+    if RESPONSE_FORMAT == "b64_json":
+        with metrics.timer("base64_decode"):
+            image_data = base64.b64decode(response.data[0].b64_json)
+    else:
+        with metrics.timer("download"):
+            image_data = await download_image(response.data[0].url)
+    
+    # Cache the image bytes and convert to PIL Image
+    with metrics.timer("decode_and_store"):
+        return await asyncio.to_thread(image_cache.put, cache_key, image_data)
+
+
+async def deliver(image, cache_key):
+    """Paths of a compressed preview and the full-resolution original, encoded in the pool"""
+    loop = asyncio.get_running_loop()
+    with metrics.timer("encode"):
+        preview = await loop.run_in_executor(encode_pool, encode_preview, image, cache_key)
+    original = await loop.run_in_executor(encode_pool, original_file, image, cache_key)
+    metrics.count("delivered_bytes_total", os.path.getsize(preview), kind="preview")
+    return preview, original
+
+
+def encode_preview(image, cache_key):
+    """Write a downscaled WebP/JPEG copy of an image (once per image and setting)"""
+    extension = "jpg" if DELIVERY_FORMAT == "JPEG" else DELIVERY_FORMAT.lower()
+    name = f"{cache_key}-{PREVIEW_SIZE}-q{DELIVERY_QUALITY}.{extension}"
+    if name in deliveries:
+        return deliveries.path(name)
+    
+    preview = image.convert("RGB")  # A copy, so the cached image isn't resized
+    preview.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.LANCZOS)
+    temp_path = f"{deliveries.path(name)}.{threading.get_ident()}.tmp"
+    preview.save(temp_path, format=DELIVERY_FORMAT, quality=DELIVERY_QUALITY)
+    return deliveries.add(name, temp_path)
+
+
+def original_file(image, cache_key):
+    """The full-resolution PNG: the cached file, or a fresh copy if it has been evicted"""
+    path = image_cache.path(cache_key)
+    if path and os.path.exists(path):
+        return path
+    
+    name = cache_key + ".png"
+    if name in deliveries:
+        return deliveries.path(name)
+    temp_path = f"{deliveries.path(name)}.{threading.get_ident()}.tmp"
+    image.save(temp_path, format="PNG")
+    return deliveries.add(name, temp_path)
+
+
+def read_batch_prompts(text, file_path):
+    """Prompts from the text box (one per line) and an uploaded CSV or text file"""
+    lines = text.splitlines() if text else []
+    if file_path:
+        with open(file_path, newline="", encoding="utf-8") as f:
+            rows = [row for row in csv.reader(f) if row]
+        # Use a "prompt" column if there is a header, otherwise the first column
+        header = [cell.strip().lower() for cell in rows[0]] if rows else []
+        if "prompt" in header:
+            column = header.index("prompt")
+            lines += [row[column] for row in rows[1:] if len(row) > column]
+        else:
+            lines += [row[0] for row in rows]
+    return [line.strip() for line in lines if line.strip()]
+
+
+async def generate_batch(text, file_path, request: gr.Request = None):
+    """
+    Generates every prompt in parallel (up to BATCH_CONCURRENCY at once).
+    Yields the gallery, a status line and finally a zip of all the images.
+    """
+    prompts = read_batch_prompts(text, file_path)
+    if not prompts:
+        yield [], "Enter some prompts, one per line, or upload a CSV file.", None
+        return
+    if len(prompts) > BATCH_MAX_PROMPTS:
+        yield [], f"Too many prompts: {len(prompts)} (the limit is {BATCH_MAX_PROMPTS}).", None
+        return
+    
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    retries_left = BATCH_RETRY_BUDGET
+    
+    async def run(index, prompt):
+        nonlocal retries_left
+        attempt = 0
+        while True:
+            async with slots:
+                try:
+                    image = await get_image(prompt, user_id(request))
+                    preview, _ = await deliver(image, prompt_key(prompt))
+                    return index, (image, preview)
+                except openai.OpenAIError as e:
+                    # The scheduler has already retried what might succeed (refused prompts won't)
+                    error, retry = e, False
+                except Exception as e:
+                    error, retry = e, retries_left > 0  # Downloads and the like
+            if not retry:
+                metrics.count("image_errors_total", stage="batch")
+                return index, error
+            retries_left -= 1
+            # Waits with its slot given up, so the rest of the batch carries on
+            await asyncio.sleep(scheduler.backoff(attempt, error))
+            attempt += 1
+    
+    images = {}  # index -> (full-resolution image, preview path)
+    errors = {}
+    tasks = [asyncio.ensure_future(run(i, prompt)) for i, prompt in enumerate(prompts)]
+    try:
+        # Show each image as soon as it's ready, in prompt order
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            if isinstance(result, Exception):
+                errors[index] = result
+            else:
+                images[index] = result
+            # The gallery shows previews; the zip has the originals
+            gallery = [(images[i][1], prompts[i]) for i in sorted(images)]
+            status = f"{len(images)}/{len(prompts)} done"
+            if errors:
+                status += f", {len(errors)} failed"
+            yield gallery, status, None
+    finally:
+        for task in tasks:
+            task.cancel()  # Stops the rest if the user leaves mid-batch
+    
+    originals = {i: image for i, (image, _) in images.items()}
+    zip_path = await asyncio.to_thread(write_batch_zip, prompts, originals, errors)
+    for i, error in sorted(errors.items()):
+        status += f"\n- {prompts[i]}: {error}"
+    try:
+        yield gallery, status, zip_path
+    finally:
+        # Gradio has copied the zip into its own cache by the time it resumes (or closes) the generator
+        os.remove(zip_path)
+
+
+def write_batch_zip(prompts, images, errors):
+    """Zip the batch's images as numbered PNGs named after their prompts"""
+    # In the delivery folder, so any left behind by a crash are trimmed with the previews
+    handle, zip_path = tempfile.mkstemp(prefix="batch-", suffix=".zip", dir=DELIVERY_DIR)
+    os.close(handle)
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        for i, image in sorted(images.items()):
+            name = re.sub(r"[^a-z0-9]+", "-", prompts[i].lower()).strip("-")[:40]
+            data = BytesIO()
+            image.save(data, format="PNG")
+            archive.writestr(f"{i + 1:03d}-{name}.png", data.getvalue())
+        if errors:
+            archive.writestr("failed.txt", "".join(f"{prompts[i]}\t{error}\n" for i, error in sorted(errors.items())))
+    return zip_path
+
 
 # Gradio UI
 iface = gr.Interface(
     fn=generate_image,
+    api_name="generate",  # Used by loadtest.py
     inputs=gr.Textbox(
         label="Enter a prompt for the image",
         placeholder="e.g., A futuristic city with flying cars at sunset",
         lines=3
     ),
-    outputs=gr.Image(label="Generated Image", type="pil"),
+    outputs=[
+        gr.Image(label="Generated Image (preview)", type="filepath"),
+        gr.DownloadButton("Download full resolution"),
+    ],
     title="OpenAI DALL-E Image Generator",
     description="Type a detailed prompt and generate an image using OpenAI's DALL-E 3 API. Be creative and descriptive!"
 )
 
+with gr.Blocks() as batch_ui:
+    gr.Markdown("Generate a whole set of images at once (for example a sprite set). "
+                "Images appear as they finish; download them all as a zip at the end.")
+    with gr.Row():
+        batch_prompts = gr.Textbox(label="Prompts, one per line", lines=8)
+        batch_file = gr.File(label="...or a CSV / text file of prompts", file_types=[".csv", ".txt"],
+                             type="filepath")
+    batch_button = gr.Button("Generate batch", variant="primary")
+    batch_status = gr.Markdown()
+    batch_gallery = gr.Gallery(label="Results", columns=4)
+    batch_zip = gr.File(label="Download all images")
+    batch_button.click(generate_batch, inputs=[batch_prompts, batch_file],
+                       outputs=[batch_gallery, batch_status, batch_zip])
+
+demo = gr.TabbedInterface([iface, batch_ui], ["Single image", "Batch"],
+                          title="OpenAI DALL-E Image Generator")
+demo.queue(default_concurrency_limit=QUEUE_CONCURRENCY, max_size=QUEUE_MAX_SIZE)
+
+# Serve the Gradio app with a Prometheus metrics endpoint beside it
+server = FastAPI()
+
+
+@server.get("/metrics", response_class=PlainTextResponse)
+def serve_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# Previews and the cached originals are served as files
+server = gr.mount_gradio_app(server, demo, path="/", allowed_paths=[DELIVERY_DIR, CACHE_DIR])
+
 # Launch the app
 if __name__ == "__main__":
-    iface.launch()
+    print(f"Running on http://{SERVER_NAME}:{SERVER_PORT} (metrics at /metrics)")
+    uvicorn.run(server, host=SERVER_NAME, port=SERVER_PORT)
@@ -0,0 +1,80 @@
+"""
+Load generator for the Gradio app: N simulated users submitting prompts at once.
+Reports throughput and latency percentiles, so concurrency and caching changes
+can be measured before they ship.
+
+    python mock_server.py &
+    IMAGE_BACKEND=mock python app.py &
+    python loadtest.py --users 20 --requests 5 --distinct 10
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gradio_client import Client
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the image generator")
+    parser.add_argument("--url", default="http://127.0.0.1:7860/", help="address of the running app")
+    parser.add_argument("--users", type=int, default=20, help="users submitting at the same time")
+    parser.add_argument("--requests", type=int, default=5, help="prompts each user submits, one after another")
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="draw prompts from this many (repeats hit the cache); 0 makes every prompt new")
+    parser.add_argument("--seed", type=int, default=None, help="seed for choosing prompts")
+    return parser.parse_args()
+
+
+def percentile(values, fraction):
+    """Value below which the given fraction of sorted values fall"""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_user(url, prompts):
+    """One user's session: submit each prompt and time the round trip"""
+    client = Client(url, verbose=False)
+    results = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        try:
+            client.predict(prompt, api_name="/generate")
+            results.append((time.perf_counter() - start, None))
+        except Exception as e:
+            results.append((time.perf_counter() - start, e))
+    return results
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    run_id = rng.randrange(1 << 30)  # New prompts are new for every run, not just within it
+
+    def prompt(user, index):
+        if args.distinct:
+            return f"Load test scene {rng.randrange(args.distinct)}"
+        return f"Load test scene {run_id}-{user}-{index}"
+
+    sessions = [[prompt(user, i) for i in range(args.requests)] for user in range(args.users)]
+    print(f"{args.users} users x {args.requests} requests against {args.url}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        results = [r for user in pool.map(lambda prompts: run_user(args.url, prompts), sessions) for r in user]
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, error in results if error is None)
+    errors = [error for _, error in results if error is not None]
+    print(f"\nCompleted: {len(latencies)}/{len(results)} in {elapsed:.1f} s "
+          f"({len(latencies) / elapsed:.2f} images/s)")
+    if latencies:
+        print("Latency (s): " + ", ".join(
+            f"p{int(f * 100)} {percentile(latencies, f):.2f}" for f in (0.5, 0.95, 0.99)
+        ) + f", max {latencies[-1]:.2f}")
+    if errors:
+        print(f"Errors: {len(errors)} (first: {errors[0]})")
+
+
+if __name__ == "__main__":
+    main()
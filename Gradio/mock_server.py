@@ -0,0 +1,110 @@
+"""
+Local stand-in for the OpenAI image API, for trying out and load testing the app.
+It answers POST /v1/images/generations like the real API (base64 or URL
+responses, rate-limit headers, 429s and 5xx errors) and serves the images over
+local HTTP.
+
+    python mock_server.py --latency 3 --error-rate 0.05
+    IMAGE_BACKEND=mock python app.py
+"""
+
+import argparse
+import asyncio
+import base64
+import math
+import random
+import time
+import uuid
+from collections import deque
+from io import BytesIO
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from PIL import Image
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fake OpenAI image API")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=2.0, help="mean seconds per generation")
+    parser.add_argument("--jitter", type=float, default=0.5, help="latency varies by up to this fraction")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls failing with a 500")
+    parser.add_argument("--rpm", type=int, default=600, help="requests per minute before 429s (0 for no limit)")
+    parser.add_argument("--payload-kb", type=int, default=1500, help="approximate size of each PNG")
+    return parser.parse_args()
+
+
+def make_payload(kilobytes):
+    """A PNG of about the given size (noise barely compresses)"""
+    side = max(8, int(math.sqrt(kilobytes * 1024 / 3)))
+    image = Image.frombytes("RGB", (side, side), random.randbytes(side * side * 3))
+    data = BytesIO()
+    image.save(data, format="PNG")
+    return data.getvalue()
+
+
+def create_server(args):
+    server = FastAPI()
+    payload = make_payload(args.payload_kb)
+    payload_b64 = base64.b64encode(payload).decode()
+    images = {}  # id -> PNG bytes for URL responses
+    recent_calls = deque()  # Times of calls in the last minute, for --rpm
+
+    def rate_limit_headers():
+        if not args.rpm:
+            return {}
+        return {
+            "x-ratelimit-limit-requests": str(args.rpm),
+            "x-ratelimit-remaining-requests": str(max(0, args.rpm - len(recent_calls))),
+            "x-ratelimit-reset-requests": f"{60 - (time.monotonic() - recent_calls[0]):.0f}s" if recent_calls else "0s",
+        }
+
+    @server.post("/v1/images/generations")
+    async def generate(request: Request):
+        body = await request.json()
+
+        now = time.monotonic()
+        while recent_calls and now - recent_calls[0] > 60:
+            recent_calls.popleft()
+        if args.rpm and len(recent_calls) >= args.rpm:
+            retry_after = 60 - (now - recent_calls[0])
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={**rate_limit_headers(), "retry-after": f"{retry_after:.1f}"},
+            )
+        recent_calls.append(now)
+
+        await asyncio.sleep(args.latency * random.uniform(1 - args.jitter, 1 + args.jitter))
+
+        if random.random() < args.error_rate:
+            return JSONResponse({"error": {"message": "Mock server error", "type": "server_error"}},
+                                status_code=500, headers=rate_limit_headers())
+
+        if body.get("response_format") == "b64_json":
+            item = {"b64_json": payload_b64}
+        else:
+            image_id = uuid.uuid4().hex
+            images[image_id] = payload
+            item = {"url": f"{request.base_url}images/{image_id}.png"}
+        item["revised_prompt"] = body.get("prompt", "")
+        return JSONResponse({"created": int(time.time()), "data": [item]}, headers=rate_limit_headers())
+
+    @server.get("/images/{image_id}.png")
+    async def image(image_id: str):
+        # Dropped once fetched, so a long load test doesn't fill up memory
+        data = images.pop(image_id, None)
+        if data is None:
+            return Response(status_code=404)
+        return Response(data, media_type="image/png")
+
+    return server
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"Mock image API on http://127.0.0.1:{args.port}/v1 "
+          f"(latency {args.latency}s, error rate {args.error_rate:.0%}, "
+          f"{'no rate limit' if not args.rpm else f'{args.rpm} requests/minute'})")
+    uvicorn.run(create_server(args), host="127.0.0.1", port=args.port, log_level="warning")
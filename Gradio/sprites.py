@@ -0,0 +1,201 @@
+"""
+Turns generated art into game sprites: keys out the plain background, trims
+and resizes each image to the Kenney sprite sizes, and packs them into
+spritesheets with XML atlases in the same <TextureAtlas> format as
+coin-quest/app/Spritesheets (one "default" sheet and one "double" sheet at twice the size).
+
+    python sprites.py batch-xyz.zip --kind tiles --name pirate-tiles
+    python sprites.py art/ --kind characters --name crew --output ../coin-quest/app/Spritesheets
+
+Images are processed in parallel in a pool of worker processes.
+"""
+
+import argparse
+import math
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from xml.sax.saxutils import quoteattr
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+# Sprite sizes in coin-quest/app/Sprites/<kind>/Default; the Double versions are twice this
+SPRITE_SIZES = {
+    "tiles": 64,
+    "enemies": 64,
+    "characters": 128,
+    "backgrounds": 256,
+}
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+KEY_TOLERANCE = 40  # How far (0-255 per channel) a pixel may be from the background colour
+EDGE_SAMPLES = 64  # Points sampled along each edge to find the background
+KEY_RESOLUTION = 256  # The background mask is found at this size, then scaled up
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Make spritesheets from generated images")
+    parser.add_argument("inputs", nargs="+", help="image files, folders of images, or batch zips from app.py")
+    parser.add_argument("--kind", choices=sorted(SPRITE_SIZES), default="tiles",
+                        help="sprite kind, which sets the tile size")
+    parser.add_argument("--name", default=None, help="sheet name (default: the kind)")
+    parser.add_argument("--output", default=".", help="folder for the sheets and atlases")
+    parser.add_argument("--keep-background", action="store_true",
+                        help="don't key out the background (default for backgrounds)")
+    parser.add_argument("--tolerance", type=int, default=KEY_TOLERANCE, help="background keying tolerance")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    return parser.parse_args()
+
+
+def sprite_name(filename):
+    """Atlas name for an image file, in the style of Kenney's names (batch numbering dropped)"""
+    stem = os.path.splitext(os.path.basename(filename))[0].lower()
+    stem = re.sub(r"^\d+-", "", stem)
+    return re.sub(r"[^a-z0-9]+", "_", stem).strip("_") or "sprite"
+
+
+def read_inputs(paths):
+    """(name, encoded bytes) for every image in the given files, folders and zips"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+                if entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    with open(entry.path, "rb") as f:
+                        sources.append((sprite_name(entry.name), f.read()))
+        elif path.lower().endswith(".zip"):
+            with zipfile.ZipFile(path) as archive:
+                for member in sorted(archive.namelist()):
+                    if member.lower().endswith(IMAGE_EXTENSIONS):
+                        sources.append((sprite_name(member), archive.read(member)))
+        else:
+            with open(path, "rb") as f:
+                sources.append((sprite_name(path), f.read()))
+
+    # Names must be unique within an atlas
+    seen = {}
+    named = []
+    for name, data in sources:
+        seen[name] = seen.get(name, 0) + 1
+        named.append((name if seen[name] == 1 else f"{name}_{seen[name]}", data))
+    return named
+
+
+def key_background(image, tolerance):
+    """
+    Make the background transparent: pixels close to the edge colour that are
+    connected to the edge (so matching colours inside the subject are kept).
+    """
+    rgb = image.convert("RGB")
+    # Flood filling is slow per pixel, so the mask is worked out on a small copy
+    small = rgb.copy()
+    small.thumbnail((KEY_RESOLUTION, KEY_RESOLUTION))
+    width, height = small.size
+    edge = [(x * (width - 1) // (EDGE_SAMPLES - 1), y) for x in range(EDGE_SAMPLES) for y in (0, height - 1)]
+    edge += [(x, y * (height - 1) // (EDGE_SAMPLES - 1)) for y in range(EDGE_SAMPLES) for x in (0, width - 1)]
+    colours = sorted(small.getpixel(point) for point in edge)
+    background = colours[len(colours) // 2]
+
+    # 255 where a pixel is close to the background colour, then fill the
+    # regions of those touching the edge with 128
+    distance = ImageChops.difference(small, Image.new("RGB", small.size, background))
+    close = distance.convert("L").point(lambda value: 255 if value <= tolerance else 0)
+    for point in edge:
+        if close.getpixel(point) == 255:
+            ImageDraw.floodfill(close, point, 128)
+
+    # Opaque everywhere except the filled background, scaled up with softened edges
+    alpha = close.point(lambda value: 0 if value == 128 else 255)
+    alpha = alpha.resize(rgb.size, Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    if image.mode == "RGBA":
+        alpha = ImageChops.multiply(alpha, image.getchannel("A"))
+    keyed = rgb.convert("RGBA")
+    keyed.putalpha(alpha)
+    return keyed
+
+
+def fit_to_tile(image, size):
+    """Scale an image to fit a square tile, centred and standing on the tile's bottom edge"""
+    scale = size / max(image.size)
+    scaled = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                          Image.LANCZOS)
+    tile = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    tile.paste(scaled, ((size - scaled.width) // 2, size - scaled.height))
+    return tile
+
+
+def process_sprite(job):
+    """Worker: one source image to its default and double sized sprites"""
+    name, data, size, keep_background, tolerance = job
+    image = Image.open(BytesIO(data))
+    image.load()
+
+    has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+    if keep_background or has_alpha:
+        image = image.convert("RGBA")  # Kept as it is, or already cut out
+    else:
+        image = key_background(image, tolerance)
+
+    # Trim the empty border so the subject fills the tile
+    if not keep_background:
+        bounds = image.getchannel("A").getbbox()
+        if bounds:
+            image = image.crop(bounds)
+
+    return name, {"default": fit_to_tile(image, size), "double": fit_to_tile(image, size * 2)}
+
+
+def pack_sheet(sprites, size):
+    """Lay equal-sized sprites out in a square-ish grid; returns the sheet and each sprite's position"""
+    columns = math.ceil(math.sqrt(len(sprites)))
+    rows = math.ceil(len(sprites) / columns)
+    sheet = Image.new("RGBA", (columns * size, rows * size), (0, 0, 0, 0))
+    positions = {}
+    for i, (name, sprite) in enumerate(sprites):
+        x, y = (i % columns) * size, (i // columns) * size
+        sheet.paste(sprite, (x, y))
+        positions[name] = (x, y)
+    return sheet, positions
+
+
+def write_atlas(path, image_name, positions, size):
+    """Atlas XML in the same layout as the Kenney spritesheets"""
+    lines = [f"<TextureAtlas imagePath={quoteattr(image_name)}>"]
+    for name in sorted(positions):
+        x, y = positions[name]
+        lines.append(f'\t<SubTexture name={quoteattr(name)} x="{x}" y="{y}" width="{size}" height="{size}"/>')
+    lines.append("</TextureAtlas>")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main():
+    args = parse_args()
+    sources = read_inputs(args.inputs)
+    if not sources:
+        print("No images found.")
+        return
+
+    size = SPRITE_SIZES[args.kind]
+    keep_background = args.keep_background or args.kind == "backgrounds"
+    jobs = [(name, data, size, keep_background, args.tolerance) for name, data in sources]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        sprites = list(pool.map(process_sprite, jobs))
+    print(f"Processed {len(sprites)} images in {time.perf_counter() - start:.1f} s")
+
+    os.makedirs(args.output, exist_ok=True)
+    name = args.name or args.kind
+    for variant, variant_size in (("default", size), ("double", size * 2)):
+        sheet_name = f"spritesheet-{name}-{variant}"
+        sheet, positions = pack_sheet([(sprite, images[variant]) for sprite, images in sprites], variant_size)
+        sheet.save(os.path.join(args.output, sheet_name + ".png"), optimize=True)
+        write_atlas(os.path.join(args.output, sheet_name + ".xml"), sheet_name + ".png", positions, variant_size)
+        print(f"  {sheet_name}.png: {sheet.width}x{sheet.height}, {len(positions)} sprites of {variant_size} px")
+
+
+if __name__ == "__main__":
+    main()
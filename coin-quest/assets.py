@@ -0,0 +1,184 @@
+"""
+Asset pack for Coin Quest
+Packs the Kenney asset folder into one file, storing each distinct file
+once (by content hash), and reads assets back out of it through a
+memory map. Assets are looked up by their name inside the asset folder,
+e.g. "Sounds/sfx_jump.ogg".
+
+    python assets.py                # (re)build assets.pack from app/
+    python assets.py --stats        # what's in the pack
+
+The game builds the pack on its first run, and rebuilds it when anything
+in app/ is newer than the pack.
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from io import BytesIO
+from pathlib import Path
+
+GAME_DIR = Path(__file__).resolve().parent
+ASSETS_DIR = GAME_DIR / "app"
+PACK_PATH = GAME_DIR / "assets.pack"
+
+PACK_MAGIC = b"CQPACK1\n"
+PACK_HEADER = struct.Struct("<8sQ")  # Magic, then the length of the JSON index after it
+PACK_ALIGN = 16  # Blobs start on 16-byte boundaries
+
+
+def build_pack(source_dirs, pack_path):
+    """
+    Write every file under the source folders into one pack. Files with the
+    same contents are stored once; the index maps each name to its blob.
+    Names found in more than one folder come from the first.
+    """
+    names = {}  # name -> digest
+    blobs = {}  # digest -> path of a file with those contents
+    for source_dir in source_dirs:
+        source_dir = Path(source_dir)
+        for root, dirs, files in os.walk(source_dir):
+            dirs.sort()
+            for filename in sorted(files):
+                path = Path(root) / filename
+                name = path.relative_to(source_dir).as_posix()
+                if name in names:
+                    continue
+                digest = hashlib.sha256(path.read_bytes()).hexdigest()
+                names[name] = digest
+                blobs.setdefault(digest, path)
+
+    # Lay the blobs out after the index; offsets are relative to the end of the index
+    layout = {}
+    offset = 0
+    for digest, path in blobs.items():
+        size = path.stat().st_size
+        layout[digest] = [offset, size]
+        offset += size + -size % PACK_ALIGN
+    index = json.dumps({"names": names, "blobs": layout}, separators=(",", ":")).encode()
+    index += b" " * (-(PACK_HEADER.size + len(index)) % PACK_ALIGN)
+
+    # Written under a temporary name so a running game never sees half a pack
+    temp_path = Path(f"{pack_path}.tmp")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(PACK_HEADER.pack(PACK_MAGIC, len(index)))
+            f.write(index)
+            for digest, path in blobs.items():
+                data = path.read_bytes()
+                f.write(data + b"\0" * (-len(data) % PACK_ALIGN))
+        os.replace(temp_path, pack_path)
+    except OSError:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return len(names), len(blobs)
+
+
+def newest_change(directory):
+    """Latest modification time of any file or folder under a folder (stat only, no opens)"""
+    newest = 0
+    for root, dirs, files in os.walk(directory):
+        newest = max([newest, os.stat(root).st_mtime] + [os.stat(os.path.join(root, f)).st_mtime for f in files])
+    return newest
+
+
+class AssetPack:
+    """Read-only, memory-mapped view of a pack written by build_pack()"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_size = PACK_HEADER.unpack_from(self.data)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{path} is not an asset pack")
+        index = json.loads(self.data[PACK_HEADER.size:PACK_HEADER.size + index_size])
+        self.names = index["names"]
+        self.blobs = index["blobs"]
+        self.base = PACK_HEADER.size + index_size
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def read(self, name):
+        """An asset's bytes, as a view into the memory map (no copy)"""
+        offset, size = self.blobs[self.names[name]]
+        start = self.base + offset
+        return memoryview(self.data)[start:start + size]
+
+    def open(self, name):
+        """An asset as a file object, for pygame's loaders"""
+        return BytesIO(self.read(name))
+
+
+class AssetStore:
+    """
+    Finds assets by name wherever the game is run from: in the pack, kept
+    up to date with the asset folder, and otherwise as loose files there.
+    """
+
+    def __init__(self, assets_dir=ASSETS_DIR, pack_path=PACK_PATH, build=True):
+        self.assets_dir = Path(assets_dir)
+        self.pack = None
+        pack_path = Path(pack_path)
+
+        # A pack older than anything in the asset folder is out of date
+        current = pack_path.exists()
+        if current and self.assets_dir.is_dir():
+            current = newest_change(self.assets_dir) <= pack_path.stat().st_mtime
+        if build and not current and self.assets_dir.is_dir():
+            try:
+                files, blobs = build_pack([self.assets_dir], pack_path)
+                print(f"Packed {files} asset files ({blobs} distinct) into {pack_path.name}")
+                current = True
+            except OSError as e:
+                print(f"Couldn't write {pack_path.name}, reading loose asset files instead: {e}")
+        if current:
+            self.pack = AssetPack(pack_path)
+
+    def __contains__(self, name):
+        if self.pack and name in self.pack:
+            return True
+        return (self.assets_dir / name).is_file()
+
+    def open(self, name):
+        if self.pack and name in self.pack:
+            return self.pack.open(name)
+        return open(self.assets_dir / name, "rb")
+
+    def digest(self, name):
+        """Hash of an asset's contents (from the pack's index when it's packed)"""
+        if self.pack and name in self.pack:
+            return self.pack.names[name]
+        return hashlib.sha256((self.assets_dir / name).read_bytes()).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Coin Quest asset pack")
+    parser.add_argument("sources", nargs="*", default=[str(ASSETS_DIR)],
+                        help="asset folders to pack (default: app/ next to this script)")
+    parser.add_argument("--output", default=str(PACK_PATH), help="pack file to write")
+    parser.add_argument("--stats", action="store_true", help="describe the existing pack instead")
+    args = parser.parse_args()
+
+    if args.stats:
+        pack = AssetPack(args.output)
+        stored = sum(size for _, size in pack.blobs.values())
+        listed = sum(pack.blobs[digest][1] for digest in pack.names.values())
+        print(f"{len(pack.names)} names, {len(pack.blobs)} distinct files")
+        print(f"{stored / 1e6:.1f} MB stored for {listed / 1e6:.1f} MB of files")
+        return
+
+    missing = [source for source in args.sources if not Path(source).is_dir()]
+    if missing:
+        sys.exit(f"Not a folder: {', '.join(missing)}")
+    files, blobs = build_pack(args.sources, args.output)
+    print(f"Packed {files} files ({blobs} distinct) into {args.output} "
+          f"({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,19 @@ Simple Platformer Game using Pygame
 Created with Kenney's New Platformer Pack
 """
 
+import time
+IMPORT_START = time.perf_counter()
+
+import argparse
 import pygame
 import sys
 import os
-from pathlib import Path
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
+from assets import AssetStore
+from images import ImageCache
+
+# Pygame's subsystems are started by the game when it needs them (see Game and
+# SoundEffects), so importing this module stays cheap
 
 # Constants
 SCREEN_WIDTH = 1000
@@ -21,30 +26,57 @@ TITLE = "Chaotic Python Platformer"
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
-BLUE = (135, 206, 235)  # Sky blue
 
 # Physics
 GRAVITY = 0.8
 JUMP_STRENGTH = -15
 MOVE_SPEED = 5
 
-# Asset paths
-ASSETS_DIR = Path("app")
-SPRITES_DIR = ASSETS_DIR / "Sprites"
-SOUNDS_DIR = ASSETS_DIR / "Sounds"
+# Assets are looked up by name in app/ (through assets.pack), wherever the game is run from
+SPRITES_DIR = "Sprites"
+SPRITESHEETS_DIR = "Spritesheets"
+SOUNDS_DIR = "Sounds"
+SOUND_FILES = {
+    'jump': 'sfx_jump.ogg',
+    'coin': 'sfx_coin.ogg',
+    'hurt': 'sfx_hurt.ogg',
+    'gem': 'sfx_gem.ogg'
+}
+COIN_SIZE = 32  # Coins are drawn from the tiles spritesheet at this size
+
+# Parallax background: Kenney background layers, each scrolling at a fraction of the camera's speed
+BACKGROUND_THEME = "hills"  # "hills", "desert", "mushrooms" or "trees"
+SKY_SCROLL = 0.1
+FAR_SCROLL = 0.3
+NEAR_SCROLL = 0.5
 
 
 class Game:
     """Main game class"""
     
-    def __init__(self):
+    def __init__(self, profile=None):
+        self.profile = profile or StartupProfile(False)
+        
+        # Only the subsystems the game uses; the mixer starts with the first sound
+        pygame.display.init()
+        pygame.font.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption(TITLE)
         self.clock = pygame.time.Clock()
         self.running = True
-        
-        # Load sounds
-        self.sounds = self.load_sounds()
+        self.font = pygame.font.Font(None, 36)
+        self.hint_font = pygame.font.Font(None, 24)
+        self.profile.mark("display + font")
+        
+        # Load assets
+        self.assets = AssetStore()
+        self.images = ImageCache(self.assets)
+        self.sounds = SoundEffects(self.assets)
+        self.tiles = self.images.load_atlas(f"{SPRITESHEETS_DIR}/spritesheet-tiles-default.xml")
+        self.background = ParallaxBackground(
+            self.images.load_atlas(f"{SPRITESHEETS_DIR}/spritesheet-backgrounds-default.xml"), BACKGROUND_THEME
+        )
+        self.profile.mark("assets")
         
         # Create game objects
         self.player = Player(100, 300, self.sounds)
@@ -54,26 +86,7 @@ class Game:
         # Score and collectibles
         self.coins_collected = 0
         self.coins = self.create_coins()
-        
-    def load_sounds(self):
-        """Load all sound effects"""
-        sounds = {}
-        sound_files = {
-            'jump': 'sfx_jump.ogg',
-            'coin': 'sfx_coin.ogg',
-            'hurt': 'sfx_hurt.ogg',
-            'gem': 'sfx_gem.ogg'
-        }
-        
-        for name, filename in sound_files.items():
-            sound_path = SOUNDS_DIR / filename
-            if sound_path.exists():
-                sounds[name] = pygame.mixer.Sound(str(sound_path))
-                sounds[name].set_volume(0.3)
-            else:
-                sounds[name] = None
-                
-        return sounds
+        self.profile.mark("level")
     
     def create_level(self):
         """Create platforms for the level"""
@@ -107,8 +120,9 @@ class Game:
             (2100, 350), (700, 150), (1300, 100)
         ]
         
+        coin_image = pygame.transform.smoothscale(self.tiles['coin_gold'], (COIN_SIZE, COIN_SIZE))
         for x, y in coin_positions:
-            coins.append(Coin(x, y))
+            coins.append(Coin(x, y, coin_image))
             
         return coins
     
@@ -137,8 +151,7 @@ class Game:
             if coin.check_collision(self.player):
                 self.coins.remove(coin)
                 self.coins_collected += 1
-                if self.sounds['coin']:
-                    self.sounds['coin'].play()
+                self.sounds.play('coin')
         
         # Update camera to follow player
         self.camera_offset = self.player.rect.centerx - SCREEN_WIDTH // 3
@@ -147,13 +160,12 @@ class Game:
         # Check if player fell off the world
         if self.player.rect.top > SCREEN_HEIGHT + 100:
             self.player.reset_position(100, 300)
-            if self.sounds['hurt']:
-                self.sounds['hurt'].play()
+            self.sounds.play('hurt')
     
     def draw(self):
         """Draw everything to screen"""
-        # Clear screen with sky color
-        self.screen.fill(BLUE)
+        # Sky and hills (covers the whole screen)
+        self.background.draw(self.screen, self.camera_offset)
         
         # Draw platforms
         for platform in self.platforms:
@@ -174,10 +186,8 @@ class Game:
     
     def draw_ui(self):
         """Draw user interface elements"""
-        font = pygame.font.Font(None, 36)
-        
         # Draw coins collected
-        coin_text = font.render(f"Coins: {self.coins_collected}/{len(self.coins) + self.coins_collected}", True, BLACK)
+        coin_text = self.font.render(f"Coins: {self.coins_collected}/{len(self.coins) + self.coins_collected}", True, BLACK)
         coin_bg = pygame.Surface((coin_text.get_width() + 20, coin_text.get_height() + 10))
         coin_bg.fill(WHITE)
         coin_bg.set_alpha(200)
@@ -186,8 +196,7 @@ class Game:
         self.screen.blit(coin_text, (20, 15))
         
         # Draw controls hint
-        hint_font = pygame.font.Font(None, 24)
-        hint_text = hint_font.render("Arrow Keys: Move | Space/Up: Jump | ESC: Quit", True, BLACK)
+        hint_text = self.hint_font.render("Arrow Keys: Move | Space/Up: Jump | ESC: Quit", True, BLACK)
         hint_bg = pygame.Surface((hint_text.get_width() + 20, hint_text.get_height() + 10))
         hint_bg.fill(WHITE)
         hint_bg.set_alpha(150)
@@ -201,12 +210,125 @@ class Game:
             self.handle_events()
             self.update()
             self.draw()
+            if not self.profile.reported:
+                self.profile.mark("first frame")
+                self.profile.report()
             self.clock.tick(FPS)
         
         pygame.quit()
         sys.exit()
 
 
+class ParallaxBackground:
+    """
+    Sky, clouds and two rows of hills, scrolling slower the further away they are.
+    Each layer is tiled once into a strip a tile wider than the screen, so a
+    frame draws it with a single blit and no scaling or compositing.
+    """
+    
+    def __init__(self, sprites, theme):
+        sky = sprites['background_solid_sky']
+        clouds = sprites['background_clouds']
+        far_hills = sprites[f'background_fade_{theme}']
+        near_hills = sprites[f'background_color_{theme}']
+        self.tile_width, tile_height = sky.get_size()
+        
+        # The Kenney tiles are opaque and stack vertically: sky, clouds, hills.
+        # The hills are cut out so the rows behind them can scroll separately:
+        # the far row without its white sky, the near row where it differs from the far row
+        hills_y = SCREEN_HEIGHT - tile_height
+        white = far_hills.get_at((0, 0))
+        far_mask = pygame.mask.from_threshold(far_hills, white, (8, 8, 8, 255))
+        far_mask.invert()
+        near_mask = pygame.mask.from_threshold(near_hills, (0, 0, 0, 255), (8, 8, 8, 255), far_hills)
+        near_mask.invert()
+        
+        sky_strip = self.make_strip(SCREEN_HEIGHT, alpha=False)
+        sky_strip.fill(white)
+        for y in range(hills_y - tile_height, -tile_height, -tile_height):
+            self.tile(sky_strip, sky, y)
+        self.tile(sky_strip, clouds, hills_y - tile_height)
+        far_strip = self.make_strip(tile_height)
+        self.tile(far_strip, far_mask.to_surface(setsurface=far_hills, unsetcolor=(0, 0, 0, 0)), 0)
+        near_strip = self.make_strip(tile_height)
+        self.tile(near_strip, near_mask.to_surface(setsurface=near_hills, unsetcolor=(0, 0, 0, 0)), 0)
+        
+        # (strip, scroll rate, top), back to front
+        self.layers = [
+            (sky_strip, SKY_SCROLL, 0),
+            (far_strip, FAR_SCROLL, hills_y),
+            (near_strip, NEAR_SCROLL, hills_y),
+        ]
+    
+    def make_strip(self, height, alpha=True):
+        tiles = -(-SCREEN_WIDTH // self.tile_width) + 1
+        if alpha:
+            return pygame.Surface((tiles * self.tile_width, height), pygame.SRCALPHA).convert_alpha()
+        return pygame.Surface((tiles * self.tile_width, height)).convert()
+    
+    def tile(self, strip, image, y):
+        for x in range(0, strip.get_width(), self.tile_width):
+            strip.blit(image, (x, y))
+    
+    def draw(self, screen, camera_offset):
+        for strip, rate, y in self.layers:
+            x = int(camera_offset * rate) % self.tile_width
+            screen.blit(strip, (-x, y))
+
+
+class SoundEffects:
+    """Sound effects, loaded (and the mixer started) the first time one is played"""
+    
+    def __init__(self, assets):
+        self.assets = assets
+        self.sounds = None  # name -> Sound, once the mixer is running
+    
+    def play(self, name):
+        if self.sounds is None:
+            self.sounds = self.load()
+        sound = self.sounds.get(name)
+        if sound:
+            sound.play()
+    
+    def load(self):
+        """Start the mixer and load all sound effects"""
+        try:
+            pygame.mixer.init()
+        except pygame.error as e:
+            print(f"Sound disabled: {e}")
+            return {}
+        
+        sounds = {}
+        for name, filename in SOUND_FILES.items():
+            sound_name = f"{SOUNDS_DIR}/{filename}"
+            if sound_name in self.assets:
+                sounds[name] = pygame.mixer.Sound(self.assets.open(sound_name))
+                sounds[name].set_volume(0.3)
+        return sounds
+
+
+class StartupProfile:
+    """Times each stage of startup up to the first frame, for --startup-profile"""
+    
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.reported = not enabled
+        self.stages = [("import", IMPORT_TIME)]
+        self.last = time.perf_counter()
+    
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+    
+    def report(self):
+        self.reported = True
+        print("\nStartup profile (ms):")
+        for stage, seconds in self.stages:
+            print(f"  {stage:15s}: {seconds * 1000:7.1f}")
+        print(f"  {'total':15s}: {(time.perf_counter() - IMPORT_START) * 1000:7.1f}")
+
+
 class Player:
     """Player character class"""
     
@@ -258,8 +380,7 @@ class Player:
             self.velocity_y = JUMP_STRENGTH
             self.on_ground = False
             self.state = 'jumping'
-            if self.sounds['jump']:
-                self.sounds['jump'].play()
+            self.sounds.play('jump')
     
     def update(self, platforms):
         """Update player position and physics"""
@@ -374,8 +495,9 @@ class Platform:
 class Coin:
     """Collectible coin class"""
     
-    def __init__(self, x, y):
+    def __init__(self, x, y, image=None):
         self.rect = pygame.Rect(x, y, 20, 20)
+        self.image = image
         self.original_y = y
         self.float_offset = 0
         self.float_speed = 0.1
@@ -395,6 +517,10 @@ class Coin:
         
         # Only draw if on screen
         if -self.rect.width < draw_x < SCREEN_WIDTH:
+            if self.image:
+                screen.blit(self.image, self.image.get_rect(center=(int(draw_x + 10), int(draw_y + 10))))
+                return
+            
             # Outer ring
             pygame.draw.circle(screen, self.color, (int(draw_x + 10), int(draw_y + 10)), 12)
             # Inner highlight
@@ -405,6 +531,12 @@ class Coin:
 
 def main():
     """Main function to start the game"""
+    parser = argparse.ArgumentParser(description=TITLE)
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='print how long each startup stage takes, up to the first frame')
+    args = parser.parse_args()
+    profile = StartupProfile(args.startup_profile)
+    
     print("=" * 50)
     print(">>> CHAOTIC PYTHON PLATFORMER <<<")
     print("=" * 50)
@@ -416,10 +548,13 @@ def main():
     print("\nStarting game...")
     print("=" * 50)
     
-    game = Game()
+    game = Game(profile)
     game.run()
 
 
+# Everything above runs on import; main() starts the game
+IMPORT_TIME = time.perf_counter() - IMPORT_START
+
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,110 @@
+"""
+Image cache for Coin Quest
+Sprites and spritesheets are stored already converted to the display's
+pixel format, as raw pixels. Later launches memory-map them and hand the
+pixels straight to pygame, with no PNG decoding or format conversion.
+Entries are keyed by the source file's content hash and the pixel format,
+so changed images or a different display get fresh entries by themselves.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pygame
+
+from assets import GAME_DIR
+
+IMAGE_CACHE_DIR = GAME_DIR / ".image_cache"
+IMAGE_HEADER = struct.Struct("<8sII")  # Magic, width, height; the pixels follow
+IMAGE_MAGIC = b"CQIMG1\n\0"
+# Pixel layouts pygame.image.frombuffer can wrap without converting
+BUFFER_FORMATS = ("RGBA", "ARGB", "BGRA")
+
+
+def pixel_format(surface):
+    """Name of a 32-bit surface's byte order (e.g. "BGRA"), as frombuffer spells it"""
+    if surface.get_bytesize() != 4:
+        return None
+    channels = dict(zip(surface.get_masks(), "RGBA"))
+    shifts = range(0, 32, 8) if sys.byteorder == "little" else range(24, -8, -8)
+    return "".join(channels.get(0xFF << shift, "X") for shift in shifts)
+
+
+class ImageCache:
+    """Loads images from the asset store through a cache of pre-converted pixels"""
+
+    def __init__(self, assets, directory=IMAGE_CACHE_DIR):
+        self.assets = assets
+        self.directory = Path(directory)
+        self.directory.mkdir(exist_ok=True)
+        self.surfaces = {}  # name -> Surface, for images used more than once
+        self.maps = []  # Memory maps behind the surfaces, kept open while they're in use
+        self.hits = 0
+        self.misses = 0
+
+        # The layout convert_alpha() gives on this display
+        self.format = pixel_format(pygame.Surface((1, 1)).convert_alpha())
+
+    def load(self, name):
+        """A surface for an image, ready to blit (like pygame.image.load(...).convert_alpha())"""
+        surface = self.surfaces.get(name)
+        if surface is not None:
+            return surface
+
+        if self.format in BUFFER_FORMATS:
+            path = self.directory / f"{self.assets.digest(name)[:24]}-{self.format}.bin"
+            surface = self.read(path)
+            if surface is None:
+                surface = self.decode(name)
+                self.write(path, surface)
+        else:
+            surface = self.decode(name)  # A layout the cache can't store; convert as usual
+
+        self.surfaces[name] = surface
+        return surface
+
+    def load_atlas(self, name):
+        """Sprites in a spritesheet, by name, from its <TextureAtlas> XML"""
+        atlas = ET.parse(self.assets.open(name)).getroot()
+        sheet = self.load(f"{os.path.dirname(name)}/{atlas.get('imagePath')}")
+        return {
+            sprite.get("name"): sheet.subsurface(pygame.Rect(
+                int(sprite.get("x")), int(sprite.get("y")), int(sprite.get("width")), int(sprite.get("height"))
+            ))
+            for sprite in atlas.iter("SubTexture")
+        }
+
+    def decode(self, name):
+        self.misses += 1
+        return pygame.image.load(self.assets.open(name), name).convert_alpha()
+
+    def read(self, path):
+        """Wrap a cached entry's pixels in a surface, or None if there isn't one"""
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        magic, width, height = IMAGE_HEADER.unpack_from(data) if len(data) >= IMAGE_HEADER.size else (None, 0, 0)
+        if magic != IMAGE_MAGIC or len(data) != IMAGE_HEADER.size + width * height * 4:
+            data.close()
+            return None
+        self.hits += 1
+        self.maps.append(data)
+        pixels = memoryview(data)[IMAGE_HEADER.size:]
+        return pygame.image.frombuffer(pixels, (width, height), self.format)
+
+    def write(self, path, surface):
+        """Store a converted surface's pixels (best effort; the game runs without the cache)"""
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(IMAGE_HEADER.pack(IMAGE_MAGIC, *surface.get_size()))
+                f.write(pygame.image.tobytes(surface, self.format))
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Couldn't cache {path.name}: {e}")
@@ -3,13 +3,17 @@
 Sail your ship, fire cannons, and explore the seas!
 """
 
+import time
+IMPORT_START = time.perf_counter()
+
+import argparse
 import pygame
 import sys
 import math
 import random
 
-# Initialize Pygame
-pygame.init()
+# Pygame's display and font are started by Game when it's created, so
+# importing this module stays cheap (the game has no sound, so no mixer)
 
 # Constants
 SCREEN_WIDTH = 1200
@@ -27,22 +31,36 @@ BROWN = (139, 69, 19)
 RED = (231, 76, 60)
 GOLD = (241, 196, 15)
 
+# Enemy targeting
+ENEMY_FIRE_RANGE = 450
+ENEMY_FIRE_ARC = 30  # Degrees either side of the bow
+TARGETING_CELL_SIZE = 40  # Line-of-sight results are cached per cell pair
+TARGETING_INTERVAL = 6  # Frames between targeting checks for each enemy
+
 
 class Game:
     """Main game class"""
     
-    def __init__(self):
+    def __init__(self, profile=None):
+        self.profile = profile or StartupProfile(False)
+        
+        pygame.display.init()
+        pygame.font.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption(TITLE)
         self.clock = pygame.time.Clock()
         self.running = True
         
         # Create game objects
-        self.player_ship = PlayerShip(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+        # West of the central island: a ship starting inside an island can't sail
+        # out of it, and the island would block every shot at it
+        self.player_ship = PlayerShip(450, SCREEN_HEIGHT // 2)
         self.islands = self.create_islands()
         self.enemy_ships = self.create_enemies()
         self.cannonballs = []
         self.treasure_chests = self.create_treasures()
+        self.targeting = EnemyTargeting(self.islands)
+        self.profile.mark("display + world")
         
         # Score
         self.score = 0
@@ -51,6 +69,7 @@ class Game:
         # Font
         self.font = pygame.font.Font(None, 36)
         self.small_font = pygame.font.Font(None, 24)
+        self.profile.mark("font")
         
     def create_islands(self):
         """Create islands to navigate around"""
@@ -126,12 +145,12 @@ class Game:
         # Update enemy ships
         for enemy in self.enemy_ships[:]:
             enemy.update(self.player_ship, self.islands)
-            
-            # Enemy shoots occasionally
-            if random.randint(0, 100) < 2:  # 2% chance each frame
-                cannonball = enemy.fire()
-                if cannonball:
-                    self.cannonballs.append(cannonball)
+        
+        # Enemies only shoot when they have a clear shot at the player
+        for enemy in self.targeting.update(self.enemy_ships, self.player_ship):
+            cannonball = enemy.fire()
+            if cannonball:
+                self.cannonballs.append(cannonball)
         
         # Update cannonballs
         for cannonball in self.cannonballs[:]:
@@ -252,6 +271,9 @@ class Game:
             self.handle_events()
             self.update()
             self.draw()
+            if not self.profile.reported:
+                self.profile.mark("first frame")
+                self.profile.report()
             self.clock.tick(FPS)
         
         # Game over screen
@@ -500,6 +522,59 @@ class EnemyShip:
         pygame.draw.polygon(screen, BLACK, sail_points, 2)
 
 
+class EnemyTargeting:
+    """Decides when enemy ships have a clear shot at the player"""
+    
+    def __init__(self, islands):
+        self.islands = islands
+        self.sight_cache = {}  # (enemy cell, player cell) -> clear line of sight
+        self.frame = 0
+    
+    def update(self, enemies, player):
+        """Return the enemies that should fire this frame"""
+        self.frame += 1
+        shooters = []
+        
+        for i, enemy in enumerate(enemies):
+            # Spread the checks out so each enemy is evaluated every few frames
+            if (self.frame + i) % TARGETING_INTERVAL != 0:
+                continue
+            if enemy.cannon_cooldown > 0:
+                continue
+            if self.has_shot(enemy, player):
+                shooters.append(enemy)
+        
+        return shooters
+    
+    def has_shot(self, enemy, player):
+        """Check range, firing arc and line of sight from enemy to player"""
+        dx = player.x - enemy.x
+        dy = player.y - enemy.y
+        if dx * dx + dy * dy > ENEMY_FIRE_RANGE ** 2:
+            return False
+        
+        # Cannons fire straight ahead, so the player must be near the bow
+        bearing = math.degrees(math.atan2(-dy, dx))
+        angle_diff = (bearing - enemy.angle + 180) % 360 - 180
+        if abs(angle_diff) > ENEMY_FIRE_ARC:
+            return False
+        
+        return self.has_line_of_sight(enemy.x, enemy.y, player.x, player.y)
+    
+    def has_line_of_sight(self, x1, y1, x2, y2):
+        """Check that no island blocks the segment, using the cell cache"""
+        key = (int(x1 // TARGETING_CELL_SIZE), int(y1 // TARGETING_CELL_SIZE),
+               int(x2 // TARGETING_CELL_SIZE), int(y2 // TARGETING_CELL_SIZE))
+        
+        clear = self.sight_cache.get(key)
+        if clear is None:
+            clear = not any(island.check_collision_segment(x1, y1, x2, y2)
+                            for island in self.islands)
+            self.sight_cache[key] = clear
+        
+        return clear
+
+
 class Cannonball:
     """Cannonball projectile"""
     
@@ -536,6 +611,23 @@ class Island:
         distance = math.sqrt((x - self.x) ** 2 + (y - self.y) ** 2)
         return distance < self.radius
     
+    def check_collision_segment(self, x1, y1, x2, y2):
+        """Check if the line segment from (x1, y1) to (x2, y2) crosses the island"""
+        seg_x = x2 - x1
+        seg_y = y2 - y1
+        length_sq = seg_x * seg_x + seg_y * seg_y
+        
+        # Find the closest point on the segment to the island centre
+        if length_sq == 0:
+            t = 0
+        else:
+            t = ((self.x - x1) * seg_x + (self.y - y1) * seg_y) / length_sq
+            t = max(0, min(1, t))
+        
+        closest_x = x1 + seg_x * t
+        closest_y = y1 + seg_y * t
+        return self.check_collision_point(closest_x, closest_y)
+    
     def draw(self, screen):
         """Draw island"""
         # Sand circle
@@ -588,8 +680,36 @@ class Treasure:
         pygame.draw.circle(screen, (255, 255, 200), (int(self.x), int(float_y)), 3)
 
 
+class StartupProfile:
+    """Times each stage of startup up to the first frame, for --startup-profile"""
+    
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.reported = not enabled
+        self.stages = [("import", IMPORT_TIME)]
+        self.last = time.perf_counter()
+    
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+    
+    def report(self):
+        self.reported = True
+        print("\nStartup profile (ms):")
+        for stage, seconds in self.stages:
+            print(f"  {stage:15s}: {seconds * 1000:7.1f}")
+        print(f"  {'total':15s}: {(time.perf_counter() - IMPORT_START) * 1000:7.1f}")
+
+
 def main():
     """Main function to start the game"""
+    parser = argparse.ArgumentParser(description=TITLE)
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='print how long each startup stage takes, up to the first frame')
+    args = parser.parse_args()
+    profile = StartupProfile(args.startup_profile)
+    
     print("=" * 60)
     print(">>> PIRATE BATTLES - NAVAL COMBAT <<<")
     print("=" * 60)
@@ -605,10 +725,13 @@ def main():
     print("\nStarting game...")
     print("=" * 60)
     
-    game = Game()
+    game = Game(profile)
     game.run()
 
 
+# Everything above runs on import; main() starts the game
+IMPORT_TIME = time.perf_counter() - IMPORT_START
+
 if __name__ == "__main__":
     main()
 
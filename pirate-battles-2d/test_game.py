@@ -0,0 +1,45 @@
+"""Tests for the enemy targeting (run with: python -m pytest)"""
+
+import math
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import game
+
+
+def make_game():
+    return game.Game()
+
+
+def test_player_starts_clear_of_islands():
+    g = make_game()
+    player = g.player_ship
+    assert not any(island.check_collision_point(player.x, player.y) for island in g.islands)
+
+
+def test_enemy_in_range_and_arc_fires_at_spawn():
+    g = make_game()
+    player = g.player_ship
+    # An enemy in open water to the west of the spawn, bow towards the player
+    enemy = game.EnemyShip(player.x - 200, player.y)
+    enemy.angle = math.degrees(math.atan2(-(player.y - enemy.y), player.x - enemy.x))
+    g.enemy_ships = [enemy]
+
+    shooters = []
+    for _ in range(game.TARGETING_INTERVAL):
+        shooters += g.targeting.update(g.enemy_ships, player)
+    assert shooters == [enemy]
+
+
+def test_enemies_hit_the_player():
+    g = make_game()
+    g.player_ship.update = lambda keys, islands: None  # The player sits still at the spawn
+    game.random.seed(1)
+    shots = 0
+    for _ in range(3000):
+        before = len(g.cannonballs)
+        g.update()
+        shots += sum(1 for ball in g.cannonballs[before:] if ball.fired_by == "enemy")
+    assert shots > 0
+    assert g.player_ship.health < 100
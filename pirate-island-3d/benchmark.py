@@ -0,0 +1,274 @@
+"""
+Headless benchmark for Pirate Island Explorer 3D
+Flies the camera along a fixed path through the island in an offscreen
+buffer and writes per-frame timings and scene counts to a JSON report.
+
+    python benchmark.py --software --output report.json
+
+Run it before and after a change (same flags, same machine) and compare
+the summaries.
+"""
+
+import argparse
+import json
+import math
+import platform
+import subprocess
+import time as clock
+from datetime import datetime, timezone
+
+from panda3d.core import loadPrcFileData
+
+# Camera path: (position, heading, pitch) keyframes, flown at a steady speed.
+# A lap around the island, then a low pass through the middle.
+BENCHMARK_PATH = [
+    ((0, 3, -25), 0, 10),
+    ((25, 6, 0), -90, 15),
+    ((0, 12, 25), -180, 30),
+    ((-25, 6, 0), -270, 15),
+    ((0, 3, -25), -360, 10),
+    ((0, 1, -12), -360, 0),
+    ((0, 1, 18), -360, 0),
+]
+BENCHMARK_FPS = 60  # Simulated frame rate, so every run moves the same way
+BENCHMARK_SEED = 1
+BENCHMARK_SIZE = (1280, 720)
+SUN_SETUP_DELAY = 0.1  # DirectionalLight sets its shadows this long after it's created
+
+
+def parse_args(tiers):
+    parser = argparse.ArgumentParser(description='Benchmark the 3D scene offscreen')
+    parser.add_argument('--frames', type=int, default=600, help='frames recorded along the path')
+    parser.add_argument('--warmup', type=int, default=60, help='frames run first while the island builds and terrain streams in')
+    parser.add_argument('--tier', default='high', choices=tiers, help='quality tier held for the whole run')
+    parser.add_argument('--software', action='store_true', help='use the software renderer (no GPU needed)')
+    parser.add_argument('--output', default='benchmark.json', help='where to write the JSON report')
+    return parser.parse_args()
+
+
+def configure_panda(software):
+    """Settings that must be in place before the Ursina app opens its buffer"""
+    loadPrcFileData('', 'window-type offscreen')
+    loadPrcFileData('', 'audio-library-name null')
+    loadPrcFileData('', 'sync-video false')
+    if software:
+        loadPrcFileData('', 'load-display p3tinydisplay')
+
+        # The first tinydisplay pipe needs an X server; the offscreen one doesn't
+        from direct.showbase.ShowBase import ShowBase
+        from panda3d.core import GraphicsPipeSelection
+
+        def make_offscreen_pipe(base, printPipeTypes=None):
+            selection = GraphicsPipeSelection.get_global_ptr()
+            for i in range(selection.get_num_pipe_types()):
+                pipe_type = selection.get_pipe_type(i)
+                if pipe_type.get_name() == 'TinyOffscreenGraphicsPipe':
+                    base.pipe = selection.make_pipe(pipe_type)
+
+        ShowBase.makeDefaultPipe = make_offscreen_pipe
+
+
+def use_virtual_monitor():
+    """Ursina centres its window on the primary monitor, which CI machines lack"""
+    import screeninfo
+    monitor = screeninfo.Monitor(x=0, y=0, width=BENCHMARK_SIZE[0], height=BENCHMARK_SIZE[1],
+                                 is_primary=True)
+    screeninfo.get_monitors = lambda: [monitor]
+
+
+def allow_mouse_lock():
+    """The player locks the mouse, which an offscreen buffer has no window for"""
+    from ursina import mouse
+    type(mouse).locked = property(
+        lambda self: getattr(self, '_locked', False),
+        lambda self, value: setattr(self, '_locked', value)
+    )
+
+
+def path_point(frame, frames):
+    """Camera position, heading and pitch for a frame along the path"""
+    progress = frame / max(1, frames - 1) * (len(BENCHMARK_PATH) - 1)
+    index = min(int(progress), len(BENCHMARK_PATH) - 2)
+    t = progress - index
+    (start, start_heading, start_pitch), (end, end_heading, end_pitch) = BENCHMARK_PATH[index:index + 2]
+    position = tuple(a + (b - a) * t for a, b in zip(start, end))
+    return position, start_heading + (end_heading - start_heading) * t, start_pitch + (end_pitch - start_pitch) * t
+
+
+def summarize(values):
+    from game import percentile
+    values = sorted(values)
+    return {
+        'mean': sum(values) / len(values),
+        'p50': percentile(values, 0.5),
+        'p95': percentile(values, 0.95),
+        'p99': percentile(values, 0.99),
+        'max': values[-1],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Benchmark:
+    """Drives the game frame by frame and times each part of the frame"""
+
+    def __init__(self, app, game, frames, warmup):
+        self.app = app
+        self.game = game
+        self.frames = frames
+        self.warmup = warmup
+        self.records = []
+        self.cull_time = 0
+        self.draw_time = 0
+
+        # The path flies the player; its own controls and gravity stay off
+        game.player.ignore = True
+        game.quality.ignore = True
+
+        # Run ursina's update (every entity's update()) inside a timer
+        self.update_time = 0
+        app.taskMgr.remove(app._update_task)
+        app._update_task = app.taskMgr.add(self.timed_update, 'update')
+
+    def timed_update(self, task):
+        start = clock.thread_time()
+        result = self.app._update(task)
+        self.update_time = clock.thread_time() - start
+        return result
+
+    def time_display_regions(self):
+        """Time the cull (scene graph traversal) and draw of every display region"""
+        from panda3d.core import PythonCallbackObject
+
+        def timed(attribute):
+            def callback(data):
+                start = clock.thread_time()
+                data.upcall()
+                setattr(self, attribute, getattr(self, attribute) + clock.thread_time() - start)
+            return PythonCallbackObject(callback)
+
+        for output in self.app.graphicsEngine.get_windows():
+            for region in output.get_active_display_regions():
+                region.set_cull_callback(timed('cull_time'))
+                region.set_draw_callback(timed('draw_time'))
+
+    def fly(self, frame, frames):
+        from ursina import Vec3
+        position, heading, pitch = path_point(frame, frames)
+        self.game.player.position = Vec3(*position)
+        self.game.player.rotation_y = heading
+        self.game.player.camera_pivot.rotation_x = pitch
+
+    def hold_tier(self, tier):
+        """Switch to a quality tier, once the sun's delayed shadow setup can no longer undo it"""
+        from game import QUALITY_TIERS
+        for _ in range(math.ceil(SUN_SETUP_DELAY * BENCHMARK_FPS) + 1):
+            self.fly(0, self.frames)
+            self.app.step()
+        self.game.quality.tier = tier
+        self.game.quality.apply(QUALITY_TIERS[tier])
+
+    def run(self):
+        # Warm up until the island has finished building, and at least the warmup frames
+        frame = 0
+        while frame < self.warmup or self.game.loader.jobs:
+            self.fly(0, self.frames)
+            self.app.step()
+            frame += 1
+
+        # Added after warmup, once terrain and shadow buffers exist
+        self.time_display_regions()
+
+        for frame in range(self.frames):
+            self.fly(frame, self.frames)
+            self.cull_time = 0
+            self.draw_time = 0
+            start = clock.thread_time()
+            self.app.step()
+            frame_time = clock.thread_time() - start
+
+            nodes, draw_calls = self.count_scene()
+            self.records.append({
+                'frame_ms': frame_time * 1000,
+                'update_ms': self.update_time * 1000,
+                'cull_ms': self.cull_time * 1000,
+                'draw_ms': self.draw_time * 1000,
+                'nodes': nodes,
+                'draw_calls': draw_calls,
+            })
+
+    def count_scene(self):
+        """Nodes in the 3D scene, and Geoms inside the view (about one draw call each)"""
+        from ursina import scene
+
+        view = self.app.camNode.get_lens().make_bounds()
+        view.xform(self.app.cam.get_mat(scene))
+        draw_calls = 0
+        for geom_node in scene.find_all_matches('**/+GeomNode'):
+            if geom_node.is_hidden():
+                continue
+            bounds = geom_node.node().get_bounds().make_copy()
+            bounds.xform(geom_node.get_mat(scene))
+            if view.contains(bounds):
+                draw_calls += geom_node.node().get_num_geoms()
+        return scene.count_num_descendants(), draw_calls
+
+    def report(self, args):
+        keys = ('frame_ms', 'update_ms', 'cull_ms', 'draw_ms', 'nodes', 'draw_calls')
+        return {
+            'commit': git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'machine': {'system': platform.system(), 'python': platform.python_version(),
+                        'renderer': self.app.win.get_gsg().get_driver_renderer()},
+            'settings': {'frames': self.frames, 'warmup': self.warmup, 'tier': args.tier,
+                         'software': args.software, 'size': BENCHMARK_SIZE,
+                         'fps': BENCHMARK_FPS, 'seed': BENCHMARK_SEED},
+            'summary': {key: summarize([record[key] for record in self.records]) for key in keys},
+            'frames': self.records,
+        }
+
+
+def main():
+    # Ursina reads the monitors when it's imported, so the virtual one comes first
+    use_virtual_monitor()
+    import game
+    tiers = [tier['name'] for tier in game.QUALITY_TIERS]
+    args = parse_args(tiers)
+    configure_panda(args.software)
+
+    from ursina import Ursina, application
+    from panda3d.core import ClockObject
+
+    app = Ursina(window_type='offscreen', size=BENCHMARK_SIZE, editor_ui_enabled=False)
+    allow_mouse_lock()
+    application.window_type = 'none'  # Window settings have no window to apply to
+
+    # Fixed time steps, so animation and streaming progress the same every run
+    globalClock.set_mode(ClockObject.M_non_real_time)
+    globalClock.set_frame_rate(BENCHMARK_FPS)
+
+    scene = game.PirateIslandGame(seed=BENCHMARK_SEED)
+    benchmark = Benchmark(app, scene, args.frames, args.warmup)
+    benchmark.hold_tier(tiers.index(args.tier))
+    benchmark.run()
+    report = benchmark.report(args)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\nBenchmark summary (ms per frame, p50 / p95 / p99):")
+    for key in ('frame_ms', 'update_ms', 'cull_ms', 'draw_ms'):
+        s = report['summary'][key]
+        print(f"  {key[:-3]:8s}: {s['p50']:7.2f} / {s['p95']:7.2f} / {s['p99']:7.2f}")
+    print(f"  nodes   : {report['summary']['nodes']['max']}")
+    print(f"  draw calls: {report['summary']['draw_calls']['p50']} (p50)")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,18 +5,110 @@ Walk around a pirate island, collect treasure, and explore in 3D!
 
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
+from panda3d.core import Texture as BufferTexture, GeomEnums, BoundingBox, Point3, Filename, PandaSystem, NodePath
+from array import array
+import hashlib
+import heapq
+import os
+import queue
 import random
+import threading
 
-class PirateIslandGame(Ursina):
-    """Main 3D pirate game"""
+# Repeated props drawn with hardware instancing.
+# Each part: (model, local scale, local offset, colour, has collider)
+PROP_TYPES = {
+    'palm_tree': [
+        ('cylinder', (0.3, 4, 0.3), (0, 0, 0), color.rgb(101, 67, 33), True),   # Trunk
+        ('sphere', (2, 1.5, 2), (0, 3, 0), color.rgb(34, 139, 34), False),      # Leaves
+    ],
+    'rock': [
+        ('sphere', (1, 0.7, 1), (0, 0, 0), color.rgb(128, 128, 128), True),
+    ],
+    'barrel': [
+        ('cylinder', (0.8, 1, 0.8), (0, 0, 0), color.rgb(139, 69, 19), True),
+    ],
+}
+
+# Level of detail: the mesh used for each part model at each level, and the
+# camera distance each level is used up to
+LOD_DISTANCES = (25, 60, 120)
+LOD_MODELS = {
+    'sphere': ('sphere', 'icosphere', 'diamond'),
+    'cylinder': ('cylinder', 'cylinder', 'cube'),
+}
+LOD_HYSTERESIS = 4  # Distance margin around each switch to avoid popping
+LOD_CELL_SIZE = 16  # Props are grouped into cells that switch level together
+
+# Billboards drawn in place of a prop past the last level: (size, offset, colour)
+PROP_IMPOSTORS = {
+    'palm_tree': ((2, 4.5), (0, 2, 0), color.rgb(60, 110, 40)),
+}
+IMPOSTOR_DISTANCE = 300
+SPARKLE_DISTANCE = 30  # Treasure sparkles drop out beyond this
+
+# Treasure animation and collection
+TREASURE_ROTATION_SPEED = 50
+TREASURE_FLOAT_SPEED = 1
+TREASURE_COLLECT_DISTANCE = 2
+TREASURE_CELL_SIZE = 4  # Must be at least the collect distance
+
+# Heightmap terrain
+ISLAND_SIZE = 40  # Sandy area across; hills and props stay inside it
+TERRAIN_SIZE = 60  # Heightmap extent, including the beach sloping under the sea
+HEIGHTMAP_SPACING = 1  # World units between height samples
+TERRAIN_CHUNK_SIZE = 10  # Must be a multiple of every step below
+TERRAIN_STEPS = (1, 2, 5)  # Samples skipped per vertex, nearest chunks first
+TERRAIN_LOD_DISTANCES = (30, 70)  # Chunk distance each step is used up to
+TERRAIN_CHUNKS_PER_FRAME = 2  # Finished chunks attached each frame
+TERRAIN_SKIRT_DEPTH = 1  # Hides cracks between chunks of different detail
+SEA_LEVEL = -0.5  # The player can wade on the sea like a floor
+
+# Static collision world
+COLLISION_CELL_SIZE = 4
+PLAYER_RADIUS = 0.5
+STEP_HEIGHT = 0.5  # Obstacles lower than this are stepped onto, not blocked by
+
+# Adaptive quality, best first. Prop density thins out props past the
+# nearest detail level.
+QUALITY_TIERS = [
+    {'name': 'ultra', 'shadows': True, 'shadow_map': 2048, 'render_scale': 1, 'lod_bias': 1.5, 'prop_density': 1},
+    {'name': 'high', 'shadows': True, 'shadow_map': 1024, 'render_scale': 1, 'lod_bias': 1, 'prop_density': 1},
+    {'name': 'medium', 'shadows': True, 'shadow_map': 512, 'render_scale': 1, 'lod_bias': 0.8, 'prop_density': 0.75},
+    {'name': 'low', 'shadows': False, 'shadow_map': 512, 'render_scale': 0.75, 'lod_bias': 0.6, 'prop_density': 0.5},
+    {'name': 'lowest', 'shadows': False, 'shadow_map': 512, 'render_scale': 0.5, 'lod_bias': 0.4, 'prop_density': 0.25},
+]
+QUALITY_START_TIER = 1  # Must have shadows on, like the sun is created with
+TARGET_FRAME_TIME = 1 / 60
+QUALITY_WINDOW = 2  # Seconds of frame times judged together
+QUALITY_DOWN_AFTER = 2  # Slow windows in a row before dropping a tier
+QUALITY_UP_AFTER = 5  # Fast windows in a row before raising a tier
+
+# Startup: scene building is spread over frames so the game starts at once
+SCENE_BUILD_BUDGET = 0.004  # Seconds of building per frame
+
+# Kenney Pirate Kit models, converted to .bam once and cached by content hash
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+KENNEY_MODEL_DIR = os.path.join(GAME_DIR, 'pirate-den', 'Models', 'GLB format')
+MODEL_CACHE_DIR = os.path.join(GAME_DIR, '.model_cache')
+MODEL_EXTENSIONS = ('.glb', '.gltf', '.obj')
+
+# Landmarks: (Kenney model, position on the ground, scale, rotation y, placeholder size)
+LANDMARKS = [
+    ('ship-wreck', (25, 0, 22), 2, 40, (3, 2, 8)),
+    ('tower-complete', (-16, 0, 15), 1.5, 0, (3, 8, 3)),
+    ('cannon', (-3, 0, -13), 1, 180, (0.8, 0.8, 1.6)),
+    ('crate', (9, 0, 6), 1, 15, (1, 1, 1)),
+    ('crate', (10, 0, 7.5), 1, 50, (1, 1, 1)),
+]
+
+
+class PirateIslandGame(Entity):
+    """Main 3D pirate game (create the Ursina app first)"""
     
-    def __init__(self):
+    def __init__(self, seed=None):
         super().__init__()
         
         # Game settings
-        window.title = "Pirate Island Explorer 3D"
-        window.borderless = False
-        window.fullscreen = False
         window.exit_button.visible = False
         window.fps_counter.enabled = True
         
@@ -24,13 +116,28 @@ class PirateIslandGame(Ursina):
         self.treasure_collected = 0
         self.total_treasures = 0
         
+        # Static scenery is collected here and merged into a few meshes
+        self.collision = CollisionWorld()
+        self.scenery = SceneryBuilder(self.collision)
+        random.seed(seed)  # A fixed seed lays the island out the same every run
+        self.heightmap = Heightmap(TERRAIN_SIZE, seed)
+        self.lod = LODManager()
+        self.props = PropInstancer(self.scenery, self.lod)
+        
         # Setup game
         self.setup_environment()
         self.setup_player()
+        
+        # The rest is queued and built a few milliseconds per frame, nearest first
+        self.loader = SceneLoader(self.player)
         self.create_island()
         self.create_treasures()
         self.create_props()
+        self.create_landmarks()
+        self.props.build(self.loader, self.sun, self.ambient)
+        self.loader.add(lambda: self.scenery.build(self.loader))  # Last, once every piece is in
         self.setup_ui()
+        self.quality = QualityGovernor(self.sun, self.lod, self.props)
         
         print("=" * 60)
         print("🏴‍☠️ PIRATE ISLAND EXPLORER 3D 🏴‍☠️")
@@ -49,10 +156,10 @@ class PirateIslandGame(Ursina):
         Sky(color=color.rgb(135, 206, 250))  # Nice blue sky
         
         # Sun/lighting
-        DirectionalLight(y=2, z=3, shadows=True, rotation=(45, -45, 45))
+        self.sun = DirectionalLight(y=2, z=3, shadows=True, rotation=(45, -45, 45))
         
         # Ambient light
-        AmbientLight(color=color.rgba(255, 255, 255, 0.3))
+        self.ambient = AmbientLight(color=color.rgba(255, 255, 255, 0.3))
         
         # Ocean (large blue plane)
         self.ocean = Entity(
@@ -60,14 +167,15 @@ class PirateIslandGame(Ursina):
             texture='white_cube',
             color=color.rgb(41, 128, 185),
             scale=(200, 1, 200),
-            y=-0.5,
-            collider='box'
+            y=SEA_LEVEL
         )
     
     def setup_player(self):
         """Setup first-person player controller"""
-        self.player = FirstPersonController(
-            position=(0, 2, -10),
+        self.player = IslandPlayer(
+            self.heightmap,
+            self.collision,
+            position=self.on_ground((0, 2, -10)),
             speed=5,
             jump_height=2
         )
@@ -77,31 +185,8 @@ class PirateIslandGame(Ursina):
         
     def create_island(self):
         """Create the main island"""
-        # Main island (large sandy platform)
-        self.island = Entity(
-            model='plane',
-            texture='white_cube',
-            color=color.rgb(194, 178, 128),  # Sand color
-            scale=(40, 1, 40),
-            y=0,
-            collider='box'
-        )
-        
-        # Add some height variation with smaller platforms
-        for i in range(5):
-            x = random.uniform(-15, 15)
-            z = random.uniform(-15, 15)
-            height = random.uniform(0.5, 2)
-            size = random.uniform(3, 8)
-            
-            Entity(
-                model='cube',
-                texture='white_cube',
-                color=color.rgb(194, 178, 128),
-                position=(x, height / 2, z),
-                scale=(size, height, size),
-                collider='box'
-            )
+        # Heightmap terrain, streamed in as chunks around the player
+        self.terrain = TerrainStreamer(self.heightmap, self.player)
         
         # Palm trees
         self.create_palm_trees()
@@ -109,6 +194,11 @@ class PirateIslandGame(Ursina):
         # Rocks
         self.create_rocks()
     
+    def on_ground(self, pos):
+        """Turn a position whose y is height above the terrain into world space"""
+        x, y, z = pos
+        return (x, self.heightmap.height_at(x, z) + y, z)
+    
     def create_palm_trees(self):
         """Create simple palm trees"""
         tree_positions = [
@@ -118,21 +208,14 @@ class PirateIslandGame(Ursina):
         ]
         
         for pos in tree_positions:
-            # Trunk
-            trunk = Entity(
-                model='cylinder',
-                color=color.rgb(101, 67, 33),
-                position=pos,
-                scale=(0.3, 4, 0.3),
-                collider='box'
-            )
-            
-            # Leaves (green sphere on top)
-            leaves = Entity(
-                model='sphere',
-                color=color.rgb(34, 139, 34),
-                position=(pos[0], pos[1] + 3, pos[2]),
-                scale=(2, 1.5, 2)
+            # Trunk with a green sphere of leaves on top, slightly varied
+            shade = random.uniform(0.85, 1)
+            self.props.add(
+                'palm_tree',
+                position=self.on_ground(pos),
+                scale=random.uniform(0.9, 1.1),
+                rotation_y=random.uniform(0, 360),
+                tint=color.rgb(255 * shade, 255 * shade, 255 * shade)
             )
     
     def create_rocks(self):
@@ -141,18 +224,19 @@ class PirateIslandGame(Ursina):
             x = random.uniform(-18, 18)
             z = random.uniform(-18, 18)
             scale_val = random.uniform(0.5, 1.5)
+            shade = random.uniform(0.8, 1.1)
             
-            Entity(
-                model='sphere',
-                color=color.rgb(128, 128, 128),
-                position=(x, scale_val / 2, z),
-                scale=(scale_val, scale_val * 0.7, scale_val),
-                collider='box'
+            self.props.add(
+                'rock',
+                position=self.on_ground((x, scale_val / 2, z)),
+                scale=scale_val,
+                rotation_y=random.uniform(0, 360),
+                tint=color.rgb(255 * shade, 255 * shade, 255 * shade)
             )
     
     def create_treasures(self):
         """Create treasure chests to collect"""
-        self.treasures = []
+        self.treasure_manager = TreasureManager(self.player, self.collect_treasure)
         treasure_positions = [
             (-10, 1, -10), (10, 1, -10), (-10, 1, 10), (10, 1, 10),
             (0, 1, 0), (-5, 1, 5), (5, 1, -5),
@@ -160,9 +244,16 @@ class PirateIslandGame(Ursina):
         ]
         
         for pos in treasure_positions:
-            treasure = Treasure(pos)
-            self.treasures.append(treasure)
+            self.loader.add(lambda pos=pos: self.add_treasure(pos), position=pos)
             self.total_treasures += 1
+        
+        # The player's raycasts only need to look at moving things
+        self.player.traverse_target = self.treasure_manager
+    
+    def add_treasure(self, pos):
+        treasure = Treasure(self.on_ground(pos))
+        self.lod.add_detail(treasure.sparkle, SPARKLE_DISTANCE)
+        self.treasure_manager.add(treasure)
     
     def create_props(self):
         """Create barrels, crates, and other props"""
@@ -173,13 +264,30 @@ class PirateIslandGame(Ursina):
         
         for pos in prop_positions:
             # Barrel
-            Entity(
-                model='cylinder',
-                color=color.rgb(139, 69, 19),
-                position=pos,
-                scale=(0.8, 1, 0.8),
-                collider='box'
-            )
+            self.props.add('barrel', position=self.on_ground(pos))
+    
+    def create_landmarks(self):
+        """Place Kenney models, shown as boxes until they finish loading"""
+        self.models = ModelCache(KENNEY_MODEL_DIR, MODEL_CACHE_DIR)
+        
+        # Placeholders are cheap, so they go in straight away rather than on the scene loader
+        for name, pos, scale, rotation_y, size in LANDMARKS:
+            landmark = Entity(position=self.on_ground(pos), scale=scale, rotation_y=rotation_y)
+            placeholder = Entity(parent=landmark, model='cube', origin_y=-0.5,
+                                 scale=size, color=color.rgb(150, 120, 90))
+            self.models.request(name, lambda model, landmark=landmark, placeholder=placeholder:
+                                self.show_landmark(landmark, placeholder, model))
+            
+            # Collision doesn't rotate, so use the longer side both ways
+            width = max(size[0], size[2]) * scale
+            x, y, z = landmark.position
+            self.scenery.add_collider('cube', (x, y + size[1] * scale / 2, z),
+                                      (width, size[1] * scale, width))
+    
+    def show_landmark(self, landmark, placeholder, model):
+        """Swap a landmark's placeholder box for its loaded model"""
+        landmark.model = model
+        destroy(placeholder)
     
     def setup_ui(self):
         """Setup user interface"""
@@ -205,19 +313,16 @@ class PirateIslandGame(Ursina):
             self.check_game_complete()
             application.quit()
     
-    def update(self):
-        """Update game (called every frame)"""
-        # Check treasure collection
-        for treasure in self.treasures[:]:
-            if treasure.check_collection(self.player.position):
-                self.treasure_collected += 1
-                self.treasures.remove(treasure)
-                treasure.collect()
-                self.update_ui()
-                
-                # Check if all treasures collected
-                if self.treasure_collected >= self.total_treasures:
-                    self.win_game()
+    def collect_treasure(self, treasure):
+        """Called by the treasure manager when the player reaches a treasure"""
+        self.treasure_collected += 1
+        self.lod.remove_detail(treasure.sparkle)
+        treasure.collect()
+        self.update_ui()
+        
+        # Check if all treasures collected
+        if self.treasure_collected >= self.total_treasures:
+            self.win_game()
     
     def update_ui(self):
         """Update UI text"""
@@ -257,6 +362,972 @@ class PirateIslandGame(Ursina):
         print("=" * 60)
 
 
+class SceneLoader(Entity):
+    """Runs queued scene-building jobs within a time budget each frame, nearest first"""
+    
+    def __init__(self, focus):
+        super().__init__()
+        self.focus = focus  # Jobs closest to this entity run first
+        self.jobs = []  # Heap of (distance, order, job)
+        self.order = 0
+        self.total = 0
+        self.start_time = time.perf_counter()
+        self.frames = 0
+        
+        self.text = Text(
+            text='Loading island...',
+            position=(0, 0.35),
+            origin=(0, 0),
+            scale=1.5,
+            color=color.white
+        )
+    
+    def add(self, job, position=None):
+        """Queue a job; jobs without a position run after all the others"""
+        distance = distance_xz(self.focus.position, Vec3(*position)) if position else math.inf
+        self.order += 1  # Keeps queue order between jobs at the same distance
+        heapq.heappush(self.jobs, (distance, self.order, job))
+        self.total += 1
+    
+    def update(self):
+        """Run jobs until this frame's budget is spent (always at least one)"""
+        if not self.jobs:
+            return
+        
+        self.frames += 1
+        start = time.perf_counter()
+        while self.jobs:
+            _, _, job = heapq.heappop(self.jobs)
+            job()
+            if time.perf_counter() - start > SCENE_BUILD_BUDGET:
+                break
+        
+        if self.jobs:
+            done = self.total - len(self.jobs)
+            self.text.text = f'Loading island... {done * 100 // self.total}%'
+        else:
+            destroy(self.text)
+            print(f"Island built in {time.perf_counter() - self.start_time:.2f} s "
+                  f"over {self.frames} frames ({self.total} jobs)")
+
+
+class SceneryBuilder:
+    """Merges static scenery into one combined mesh per material and cell"""
+    
+    def __init__(self, collision):
+        self.batches = {}  # (texture, cell) -> parent entity holding the pieces
+        self.collision = collision
+    
+    def add(self, model, color, position, scale, rotation=(0, 0, 0), texture=None, collider=False):
+        """Queue a static piece of scenery"""
+        key = (texture, int(position[0] // LOD_CELL_SIZE), int(position[2] // LOD_CELL_SIZE))
+        batch = self.batches.get(key)
+        if batch is None:
+            batch = Entity(texture=texture)
+            self.batches[key] = batch
+        
+        Entity(parent=batch, model=model, color=color, position=position,
+               scale=scale, rotation=rotation)
+        
+        if collider:
+            self.add_collider(model, position, scale)
+    
+    def add_collider(self, model, position, scale):
+        """Add a collider for scenery that is rendered elsewhere"""
+        # Collision lives in its own world so the render meshes can be
+        # merged (or instanced) freely
+        self.collision.add(model, position, scale)
+    
+    def build(self, loader):
+        """Queue merging the batches, one per job so each fits in a frame's budget"""
+        for batch in self.batches.values():
+            loader.add(lambda batch=batch: self.merge(batch))
+    
+    def merge(self, batch):
+        """Flatten a batch's pieces into one mesh (one node and draw call)"""
+        # Copies of the pieces' nodes, without the entities, so Panda can
+        # bake each transform and colour into the vertices. That runs natively
+        # and keeps the normals; ursina's combine() took seconds and dropped them
+        merged = NodePath('scenery')
+        for piece in batch.children:
+            piece.copy_to(merged).clear_python_tag('Entity')
+        merged.flatten_strong()
+        
+        for piece in list(batch.children):
+            destroy(piece)
+        merged.reparent_to(batch)
+
+
+instanced_prop_shader = Shader(
+    name='instanced_prop_shader',
+    language=Shader.GLSL,
+    vertex='''
+#version 140
+uniform mat4 p3d_ModelViewMatrix;
+uniform mat4 p3d_ProjectionMatrix;
+uniform samplerBuffer instance_data;
+uniform vec3 part_scale;
+uniform vec3 part_offset;
+uniform float billboard;
+in vec4 p3d_Vertex;
+in vec3 p3d_Normal;
+out vec4 tint;
+out vec3 normal;
+
+vec3 rotate_y(vec3 v, float angle) {
+    float c = cos(angle);
+    float s = sin(angle);
+    return vec3(v.x * c + v.z * s, v.y, -v.x * s + v.z * c);
+}
+
+void main() {
+    // Three texels per instance: position + yaw, scale, tint
+    int base = gl_InstanceID * 3;
+    vec4 placement = texelFetch(instance_data, base);
+    vec3 scale = texelFetch(instance_data, base + 1).xyz;
+    tint = texelFetch(instance_data, base + 2);
+
+    if (billboard > 0.5) {
+        // Impostor: a quad that always faces the camera
+        vec4 center = p3d_ModelViewMatrix * vec4(placement.xyz + part_offset * scale, 1.0);
+        center.xy += p3d_Vertex.xy * part_scale.xy * scale.xy;
+        normal = vec3(0.0, 1.0, 0.0);
+        gl_Position = p3d_ProjectionMatrix * center;
+        return;
+    }
+
+    vec3 local = (part_offset + p3d_Vertex.xyz * part_scale) * scale;
+    vec3 world = rotate_y(local, placement.w) + placement.xyz;
+    normal = rotate_y(normalize(p3d_Normal / part_scale), placement.w);
+    gl_Position = p3d_ProjectionMatrix * (p3d_ModelViewMatrix * vec4(world, 1.0));
+}
+''',
+    fragment='''
+#version 140
+uniform vec4 p3d_ColorScale;
+uniform vec3 sun_direction;
+uniform vec3 ambient;
+uniform float billboard;
+in vec4 tint;
+in vec3 normal;
+out vec4 fragColor;
+
+void main() {
+    vec3 light = ambient + (1.0 - ambient) * max(dot(normalize(normal), -sun_direction), 0.0);
+    if (billboard > 0.5) {
+        light = vec3(0.8);
+    }
+    fragColor = vec4(p3d_ColorScale.rgb * tint.rgb * light, p3d_ColorScale.a);
+}
+''',
+    default_input={
+        'part_scale': Vec3(1, 1, 1),
+        'part_offset': Vec3(0, 0, 0),
+        'billboard': 0,
+        'sun_direction': Vec3(0, -1, 0),
+        'ambient': Vec3(0.3, 0.3, 0.3),
+    }
+)
+
+
+def instancing_supported():
+    """Check the graphics card can do instanced draws from a buffer texture"""
+    gsg = application.base.win.getGsg()
+    return (gsg is not None and gsg.getSupportsGlsl()
+            and gsg.getSupportsBufferTexture()
+            and gsg.getSupportsGeometryInstancing())
+
+
+class PropInstancer:
+    """Draws every copy of a prop type with one instanced draw call per part"""
+    
+    def __init__(self, scenery, lod):
+        self.scenery = scenery  # Colliders, and the fallback without instancing
+        self.lod = lod
+        self.sun = None  # Lights the instanced parts like the rest of the scene
+        self.ambient = None
+        self.instances = {prop: [] for prop in PROP_TYPES}
+        self.thinnable = []  # (entity, instance count) drawn past the nearest level
+        self.density = 1
+    
+    def add(self, prop, position, scale=1, rotation_y=0, tint=color.white):
+        """Queue one copy of a prop with its own transform and colour"""
+        self.instances[prop].append((Vec3(*position), scale, rotation_y, tint))
+        
+        for model, part_scale, part_offset, _, has_collider in PROP_TYPES[prop]:
+            if has_collider:
+                self.scenery.add_collider(
+                    model,
+                    position=Vec3(*position) + Vec3(*part_offset) * scale,
+                    scale=Vec3(*part_scale) * scale
+                )
+    
+    def build(self, loader, sun, ambient):
+        """Queue the instanced entities (or merged scenery as a fallback) on the scene loader"""
+        instanced = instancing_supported()
+        self.sun = sun
+        self.ambient = ambient
+        
+        for prop, instances in self.instances.items():
+            if not instances:
+                continue
+            
+            if not instanced:
+                for part in PROP_TYPES[prop]:
+                    for instance in instances:
+                        loader.add(lambda part=part, instance=instance: self.build_merged(part, [instance]),
+                                   position=instance[0])
+                continue
+            
+            # Thinning draws the first copies in each cell, and the hand-placed
+            # lists are in no random order, so shuffle once (with the island's seed)
+            random.shuffle(instances)
+            
+            # Group copies into cells so detail can drop off with distance
+            cells = {}
+            for instance in instances:
+                position = instance[0]
+                key = (int(position.x // LOD_CELL_SIZE), int(position.z // LOD_CELL_SIZE))
+                cells.setdefault(key, []).append(instance)
+            
+            for key, cell_instances in cells.items():
+                center = ((key[0] + 0.5) * LOD_CELL_SIZE, 0, (key[1] + 0.5) * LOD_CELL_SIZE)
+                loader.add(lambda prop=prop, cell_instances=cell_instances:
+                           self.build_cell(prop, cell_instances), position=center)
+    
+    def build_cell(self, prop, instances):
+        """One LOD group per cell: an entity per detail level, sharing one buffer"""
+        data = array('f')
+        for position, scale, rotation_y, tint in instances:
+            data.extend((position.x, position.y, position.z, math.radians(rotation_y)))
+            data.extend((scale, scale, scale, 0))
+            data.extend((tint[0], tint[1], tint[2], tint[3]))
+        
+        # Per-instance transforms live in a buffer texture on the GPU
+        buffer = BufferTexture('prop_instances')
+        buffer.setup_buffer_texture(len(instances) * 3, BufferTexture.T_float,
+                                    BufferTexture.F_rgba32, GeomEnums.UH_static)
+        buffer.set_ram_image(data.tobytes())
+        
+        # The meshes only cover one copy, so give the nodes bounds for all of them
+        reach = max(max(part[1]) + Vec3(*part[2]).length() for part in PROP_TYPES[prop])
+        low = Point3(*(min(i[0][axis] - reach * i[1] for i in instances) for axis in range(3)))
+        high = Point3(*(max(i[0][axis] + reach * i[1] for i in instances) for axis in range(3)))
+        bounds = BoundingBox(low, high)
+        
+        levels = []
+        for level, distance in enumerate(LOD_DISTANCES):
+            root = Entity()
+            for model, part_scale, part_offset, part_color, _ in PROP_TYPES[prop]:
+                part = self.instanced_entity(root, LOD_MODELS[model][level], part_scale,
+                                             part_offset, part_color, buffer, len(instances), bounds)
+                if level > 0:
+                    self.thin(part, len(instances))
+            levels.append((root, distance))
+        
+        if prop in PROP_IMPOSTORS:
+            size, offset, impostor_color = PROP_IMPOSTORS[prop]
+            root = Entity()
+            part = self.instanced_entity(root, 'quad', (*size, 1), offset, impostor_color,
+                                         buffer, len(instances), bounds)
+            part.set_shader_input('billboard', 1)
+            self.thin(part, len(instances))
+            levels.append((root, IMPOSTOR_DISTANCE))
+        
+        center = Vec3(*((low[axis] + high[axis]) / 2 for axis in range(3)))
+        self.lod.add_group(LODGroup(center, levels))
+    
+    def instanced_entity(self, parent, model, part_scale, part_offset, part_color,
+                         buffer, count, bounds):
+        """An entity whose mesh is drawn once per instance, placed by the shader"""
+        entity = Entity(parent=parent, model=model, color=part_color,
+                        shader=instanced_prop_shader)
+        entity.set_shader_input('instance_data', buffer)
+        entity.set_shader_input('part_scale', Vec3(*part_scale))
+        entity.set_shader_input('part_offset', Vec3(*part_offset))
+        # The shader lights the parts itself, from the scene's sun and ambient light
+        entity.set_shader_input('sun_direction', self.sun.forward)
+        entity.set_shader_input('ambient', self.ambient.color.xyz * self.ambient.color.w)
+        entity.setInstanceCount(count)
+        entity.node().setBounds(bounds)
+        entity.node().setFinal(True)
+        return entity
+    
+    def set_density(self, density):
+        """Draw only a fraction of the copies of distant props"""
+        self.density = density
+        # The copies were shuffled before building, so the first few are an even sample
+        for entity, count in self.thinnable:
+            entity.setInstanceCount(max(1, round(count * density)))
+    
+    def thin(self, entity, count):
+        """Let a distant-detail entity follow the prop density, now and on later changes"""
+        self.thinnable.append((entity, count))
+        entity.setInstanceCount(max(1, round(count * self.density)))
+    
+    def build_merged(self, part, instances):
+        """Bake every copy into the static scenery batches instead"""
+        model, part_scale, part_offset, part_color, _ = part
+        for position, scale, rotation_y, tint in instances:
+            self.scenery.add(
+                model=model,
+                color=Color(*(c * t for c, t in zip(part_color, tint))),
+                position=position + Vec3(*part_offset) * scale,
+                scale=Vec3(*part_scale) * scale,
+                rotation=(0, rotation_y, 0)
+            )
+
+
+def lod_level(level, distance, limits, bias=1):
+    """Step a detail level towards the one for a distance, with hysteresis.
+    limits[i] is the distance level i is used up to."""
+    while level < len(limits) and distance > limits[level] * bias + LOD_HYSTERESIS:
+        level += 1
+    while level > 0 and distance < limits[level - 1] * bias - LOD_HYSTERESIS:
+        level -= 1
+    return level
+
+
+class LODGroup:
+    """A set of entities showing the same content at decreasing detail"""
+    
+    def __init__(self, center, levels):
+        self.center = center
+        self.levels = levels  # (entity, distance it is used up to), nearest first
+        self.level = None
+        for entity, _ in levels:
+            entity.enabled = False
+    
+    def update(self, distance, bias=1):
+        """Switch level for the camera distance"""
+        last = len(self.levels)  # Past the last level nothing is drawn
+        level = lod_level(self.level or 0, distance,
+                          [max_distance for _, max_distance in self.levels], bias)
+        
+        if level != self.level:
+            if self.level is not None and self.level < last:
+                self.levels[self.level][0].enabled = False
+            if level < last:
+                self.levels[level][0].enabled = True
+            self.level = level
+
+
+class LODManager(Entity):
+    """Picks detail levels for props and small details by camera distance"""
+    
+    def __init__(self):
+        super().__init__()
+        self.groups = []
+        self.details = {}  # entity -> distance it stops being drawn at
+        self.bias = 1  # Scales every switch distance
+    
+    def add_group(self, group):
+        self.groups.append(group)
+    
+    def add_detail(self, entity, distance):
+        """Register a small entity that is hidden when far from the camera"""
+        self.details[entity] = distance
+    
+    def remove_detail(self, entity):
+        self.details.pop(entity, None)
+    
+    def update(self):
+        """Update every group and detail for the current camera position"""
+        eye = camera.world_position
+        
+        for group in self.groups:
+            group.update(distance(eye, group.center), self.bias)
+        
+        for entity, max_distance in self.details.items():
+            dist = distance(eye, entity.world_position)
+            if entity.enabled and dist > max_distance * self.bias + LOD_HYSTERESIS:
+                entity.enabled = False
+            elif not entity.enabled and dist < max_distance * self.bias - LOD_HYSTERESIS:
+                entity.enabled = True
+
+
+class Heightmap:
+    """Island heights sampled on a grid, with cheap lookups for collision"""
+    
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.samples = int(size / HEIGHTMAP_SPACING)  # Cells across
+        self.origin = -size / 2
+        
+        # A few smooth hills on the sand, scaled with the island's area
+        rng = random.Random(seed)
+        hill_range = ISLAND_SIZE * 0.375
+        self.hills = []
+        for i in range(max(5, int(5 * (ISLAND_SIZE / 40) ** 2))):
+            self.hills.append((
+                rng.uniform(-hill_range, hill_range),
+                rng.uniform(-hill_range, hill_range),
+                rng.uniform(0.5, 2),  # Height
+                rng.uniform(1.5, 4)   # Radius
+            ))
+        
+        row = self.samples + 1
+        self.heights = [
+            self.shape(self.origin + ix * HEIGHTMAP_SPACING, self.origin + iz * HEIGHTMAP_SPACING)
+            for iz in range(row) for ix in range(row)
+        ]
+    
+    def shape(self, x, z):
+        """Height of the island profile plus hills at a point"""
+        # Flat sand in the middle, sloping into the sea at the edges
+        edge = math.sqrt(x * x + z * z) / (ISLAND_SIZE / 2)
+        height = -1.5 * min(1, max(0, edge - 0.9) / 0.4)
+        
+        for hill_x, hill_z, hill_height, radius in self.hills:
+            d2 = (x - hill_x) ** 2 + (z - hill_z) ** 2
+            height += hill_height * math.exp(-d2 / (2 * radius * radius))
+        return height
+    
+    def sample(self, ix, iz):
+        """Height at a grid sample, clamped to the edge of the map"""
+        ix = min(max(ix, 0), self.samples)
+        iz = min(max(iz, 0), self.samples)
+        return self.heights[iz * (self.samples + 1) + ix]
+    
+    def height_at(self, x, z):
+        """Bilinearly interpolated height at a world position"""
+        gx = (x - self.origin) / HEIGHTMAP_SPACING
+        gz = (z - self.origin) / HEIGHTMAP_SPACING
+        ix = math.floor(gx)
+        iz = math.floor(gz)
+        fx = gx - ix
+        fz = gz - iz
+        
+        near = self.sample(ix, iz) * (1 - fx) + self.sample(ix + 1, iz) * fx
+        far = self.sample(ix, iz + 1) * (1 - fx) + self.sample(ix + 1, iz + 1) * fx
+        return near * (1 - fz) + far * fz
+
+
+class TerrainChunk:
+    """One square of terrain and the detail it is shown and requested at"""
+    
+    def __init__(self, key, center):
+        self.key = key
+        self.center = center
+        self.entity = None
+        self.level = 0
+        self.requested = None  # Step of the newest mesh asked for
+
+
+class TerrainStreamer(Entity):
+    """Builds the island as mesh chunks on a worker thread and attaches them over time"""
+    
+    def __init__(self, heightmap, focus):
+        super().__init__()
+        self.heightmap = heightmap
+        self.focus = focus  # Detail is highest around this entity
+        self.chunks = {}
+        self.requests = queue.PriorityQueue()
+        self.results = queue.Queue()
+        self.request_order = 0
+        self.timer = 0
+        
+        count = math.ceil(heightmap.size / TERRAIN_CHUNK_SIZE)
+        for cx in range(count):
+            for cz in range(count):
+                center = Vec3(heightmap.origin + (cx + 0.5) * TERRAIN_CHUNK_SIZE, 0,
+                              heightmap.origin + (cz + 0.5) * TERRAIN_CHUNK_SIZE)
+                self.chunks[(cx, cz)] = TerrainChunk((cx, cz), center)
+        
+        self.worker = threading.Thread(target=self.build_chunks, daemon=True)
+        self.worker.start()
+        self.request_chunks()
+    
+    def request_chunks(self):
+        """Ask the worker for any chunk whose detail level should change"""
+        for chunk in self.chunks.values():
+            dist = distance_xz(self.focus.position, chunk.center)
+            chunk.level = lod_level(chunk.level, dist, TERRAIN_LOD_DISTANCES)
+            step = TERRAIN_STEPS[chunk.level]
+            if step != chunk.requested:
+                chunk.requested = step
+                # Nearest chunks are built first
+                self.request_order += 1
+                self.requests.put((dist, self.request_order, chunk.key, step))
+    
+    def build_chunks(self):
+        """Worker thread: turn requests into mesh data (plain lists only)"""
+        while True:
+            _, _, key, step = self.requests.get()
+            self.results.put((key, step) + self.build_mesh_data(key, step))
+    
+    def build_mesh_data(self, key, step):
+        """Vertices, triangles, colours and normals for one chunk at a step"""
+        heightmap = self.heightmap
+        cells = int(TERRAIN_CHUNK_SIZE / HEIGHTMAP_SPACING)
+        start_x = key[0] * cells
+        start_z = key[1] * cells
+        side = cells // step + 1
+        
+        vertices, triangles, colors, normals = [], [], [], []
+        for j in range(side):
+            for i in range(side):
+                ix = start_x + i * step
+                iz = start_z + j * step
+                height = heightmap.sample(ix, iz)
+                vertices.append((heightmap.origin + ix * HEIGHTMAP_SPACING, height,
+                                 heightmap.origin + iz * HEIGHTMAP_SPACING))
+                colors.append(terrain_color(height))
+                
+                # Normal from the slope between neighbouring samples
+                dx = heightmap.sample(ix + 1, iz) - heightmap.sample(ix - 1, iz)
+                dz = heightmap.sample(ix, iz + 1) - heightmap.sample(ix, iz - 1)
+                length = math.sqrt(dx * dx + 4 * HEIGHTMAP_SPACING ** 2 + dz * dz)
+                normals.append((-dx / length, 2 * HEIGHTMAP_SPACING / length, -dz / length))
+                
+                if i > 0 and j > 0:
+                    v = j * side + i
+                    triangles.append((v, v - 1, v - side - 1))
+                    triangles.append((v - side - 1, v - side, v))
+        
+        # Skirt hanging down from each edge, drawn from both sides
+        edges = (
+            [j * side for j in range(side)],
+            [j * side + side - 1 for j in range(side)],
+            list(range(side)),
+            [(side - 1) * side + i for i in range(side)],
+        )
+        for edge in edges:
+            for a, b in zip(edge, edge[1:]):
+                top = len(vertices)
+                for v in (a, b):
+                    x, y, z = vertices[v]
+                    vertices.append((x, y - TERRAIN_SKIRT_DEPTH, z))
+                    colors.append(colors[v])
+                    normals.append(normals[v])
+                triangles.append((a, b, top + 1))
+                triangles.append((top + 1, top, a))
+                triangles.append((top + 1, b, a))
+                triangles.append((a, top, top + 1))
+        
+        return vertices, triangles, colors, normals
+    
+    def update(self):
+        """Re-check chunk detail a few times a second and attach finished chunks"""
+        self.timer += time.dt
+        if self.timer > 0.25:
+            self.timer = 0
+            self.request_chunks()
+        
+        for i in range(TERRAIN_CHUNKS_PER_FRAME):
+            try:
+                key, step, vertices, triangles, colors, normals = self.results.get_nowait()
+            except queue.Empty:
+                break
+            
+            chunk = self.chunks[key]
+            if step != chunk.requested:
+                continue  # A newer request has replaced this one
+            
+            if chunk.entity:
+                destroy(chunk.entity)
+            chunk.entity = Entity(
+                parent=self,
+                model=Mesh(vertices=vertices, triangles=triangles,
+                           colors=colors, normals=normals)
+            )
+
+
+def terrain_color(height):
+    """Wet sand under the sea, dry sand above and grass on the hilltops"""
+    if height < -0.3:
+        return (0.63, 0.57, 0.39, 1)
+    if height > 1.5:
+        return (0.45, 0.6, 0.3, 1)
+    return (0.76, 0.7, 0.5, 1)
+
+
+class ModelCache(Entity):
+    """Converts source models to .bam once and loads them in the background"""
+    
+    def __init__(self, source_dir, cache_dir):
+        super().__init__()
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self.models = {}  # model name -> loaded model, copied for each request
+        self.waiting = {}  # model name -> callbacks for when it's loaded
+        self.missing = set()
+        self.hash_requests = queue.Queue()
+        self.hashed = queue.Queue()
+        self.start_time = time.perf_counter()
+        self.loads = {'cold': 0, 'warm': 0}
+        
+        self.worker = threading.Thread(target=self.hash_sources, daemon=True)
+        self.worker.start()
+    
+    def request(self, name, on_ready):
+        """Load a model by name and pass it to on_ready (a copy per request)"""
+        if name in self.models:
+            on_ready(self.models[name].copy_to(NodePath()))
+            return
+        if name in self.waiting:
+            self.waiting[name].append(on_ready)
+            return
+        
+        source = self.find_source(name)
+        if not source:
+            if name not in self.missing:
+                self.missing.add(name)
+                print(f"Model '{name}' not found in {self.source_dir}, keeping its placeholder")
+            return
+        self.waiting[name] = [on_ready]
+        self.hash_requests.put((name, source))
+    
+    def find_source(self, name):
+        for extension in MODEL_EXTENSIONS:
+            path = os.path.join(self.source_dir, name + extension)
+            if os.path.exists(path):
+                return path
+        return None
+    
+    def hash_sources(self):
+        """Worker thread: find the cache file for each source from its contents"""
+        while True:
+            name, source = self.hash_requests.get()
+            digest = hashlib.sha1()
+            digest.update(PandaSystem.get_version_string().encode())  # .bam files follow Panda's version
+            with open(source, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 16), b''):
+                    digest.update(block)
+            self.hashed.put((name, source, os.path.join(self.cache_dir, f'{name}-{digest.hexdigest()[:16]}.bam')))
+    
+    def update(self):
+        """Start a background load for every source that has been hashed"""
+        while True:
+            try:
+                name, source, cached = self.hashed.get_nowait()
+            except queue.Empty:
+                break
+            
+            # Warm starts read the cached .bam; cold starts convert the source
+            kind = 'warm' if os.path.exists(cached) else 'cold'
+            path = cached if kind == 'warm' else source
+            application.base.loader.loadModel(
+                Filename.from_os_specific(path),
+                callback=lambda model, name=name, cached=cached, kind=kind:
+                    self.loaded(name, cached, kind, model)
+            )
+    
+    def loaded(self, name, cached, kind, model):
+        """Called on the main thread once Panda's loader thread has the model"""
+        callbacks = self.waiting.pop(name)
+        if not model:
+            print(f"Model '{name}' failed to load, keeping its placeholder")
+            return
+        
+        if kind == 'cold':
+            self.store(name, cached, model)
+        self.loads[kind] += 1
+        self.models[name] = model
+        
+        for on_ready in callbacks:
+            on_ready(model.copy_to(NodePath()))
+        
+        if not self.waiting:
+            print(f"Models ready in {time.perf_counter() - self.start_time:.2f} s "
+                  f"({'cold' if self.loads['cold'] else 'warm'} start: {self.loads['cold']} converted "
+                  f"to .bam, {self.loads['warm']} loaded from the cache)")
+    
+    def store(self, name, cached, model):
+        """Write a converted model to the cache, replacing older versions of it"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for file in os.listdir(self.cache_dir):
+            if file.endswith('.bam') and file.rsplit('-', 1)[0] == name:
+                os.remove(os.path.join(self.cache_dir, file))
+        model.write_bam_file(Filename.from_os_specific(cached))
+
+
+class StaticCollider:
+    """An upright shape (box or cylinder) in the static collision world"""
+    __slots__ = ('round', 'min_x', 'min_z', 'max_x', 'max_z', 'bottom', 'top')
+    
+    def __init__(self, round, min_x, min_z, max_x, max_z, bottom, top):
+        self.round = round  # Cylinder fitted inside the box, seen from above
+        self.min_x = min_x
+        self.min_z = min_z
+        self.max_x = max_x
+        self.max_z = max_z
+        self.bottom = bottom
+        self.top = top
+    
+    def overlaps(self, x, z, radius):
+        """Check if a circle on the ground plane touches the shape"""
+        if self.round:
+            center_x = (self.min_x + self.max_x) / 2
+            center_z = (self.min_z + self.max_z) / 2
+            reach = (self.max_x - self.min_x) / 2 + radius
+            return (x - center_x) ** 2 + (z - center_z) ** 2 < reach * reach
+        
+        return (self.min_x - radius < x < self.max_x + radius
+                and self.min_z - radius < z < self.max_z + radius)
+
+
+class CollisionWorld:
+    """Grid broadphase over static scenery colliders, built once at startup"""
+    
+    def __init__(self):
+        self.cells = {}  # (cell x, cell z) -> colliders overlapping the cell
+    
+    def add(self, model, position, scale):
+        """Add a collider fitted to a scenery piece's model"""
+        x, y, z = position
+        sx, sy, sz = scale
+        
+        if model == 'cylinder':  # Base at the position
+            shape = StaticCollider(True, x - sx / 2, z - sz / 2, x + sx / 2, z + sz / 2, y, y + sy)
+        else:  # Centred on the position
+            shape = StaticCollider(model == 'sphere', x - sx / 2, z - sz / 2,
+                                   x + sx / 2, z + sz / 2, y - sy / 2, y + sy / 2)
+        
+        for cell in self.cells_between(shape.min_x, shape.min_z, shape.max_x, shape.max_z):
+            self.cells.setdefault(cell, []).append(shape)
+    
+    def cells_between(self, min_x, min_z, max_x, max_z):
+        for cx in range(int(min_x // COLLISION_CELL_SIZE), int(max_x // COLLISION_CELL_SIZE) + 1):
+            for cz in range(int(min_z // COLLISION_CELL_SIZE), int(max_z // COLLISION_CELL_SIZE) + 1):
+                yield (cx, cz)
+    
+    def query(self, x, z, radius):
+        """Colliders touching a circle on the ground plane"""
+        found = []
+        for cell in self.cells_between(x - radius, z - radius, x + radius, z + radius):
+            for shape in self.cells.get(cell, ()):
+                if shape not in found and shape.overlaps(x, z, radius):
+                    found.append(shape)
+        return found
+
+
+class IslandPlayer(FirstPersonController):
+    """First-person controller that walks on the heightmap and static collision world"""
+    
+    def __init__(self, heightmap, collision, **kwargs):
+        super().__init__(**kwargs)
+        self.heightmap = heightmap
+        self.collision = collision
+    
+    def update(self):
+        """Same controls as FirstPersonController, without raycasting the scenery"""
+        self.rotation_y += mouse.velocity[0] * self.mouse_sensitivity[1]
+        
+        self.camera_pivot.rotation_x -= mouse.velocity[1] * self.mouse_sensitivity[0]
+        self.camera_pivot.rotation_x = clamp(self.camera_pivot.rotation_x, -90, 90)
+        
+        self.direction = Vec3(
+            self.forward * (held_keys['w'] - held_keys['s'])
+            + self.right * (held_keys['d'] - held_keys['a'])
+        ).normalized()
+        
+        # Moving things (treasures) are still raycast, but there are only a few
+        dynamic_hit = raycast(self.position + Vec3(0, 0.5, 0), self.direction, distance=0.5,
+                              traverse_target=self.traverse_target, ignore=self.ignore_list).hit
+        if not dynamic_hit:
+            # Long frames are split up so thin obstacles can't be skipped over
+            move = self.direction * time.dt * self.speed
+            steps = max(1, math.ceil(move.length() / PLAYER_RADIUS))
+            move /= steps
+            for i in range(steps):
+                # Move each axis on its own so the player slides along obstacles
+                if move.x and not self.blocked(self.x + move.x, self.z):
+                    self.x += move.x
+                if move.z and not self.blocked(self.x, self.z + move.z):
+                    self.z += move.z
+        
+        if self.gravity:
+            gap = self.y - self.ground_height()
+            if gap <= 0.1:
+                if not self.grounded:
+                    self.land()
+                self.grounded = True
+                self.y -= gap
+                return
+            
+            # Fall, without dropping below the ground
+            self.grounded = False
+            self.y -= min(self.air_time * time.dt * 100, gap)
+            self.air_time += time.dt * 0.25 * self.gravity
+    
+    def blocked(self, x, z):
+        """Check if standing at (x, z) would walk into static scenery"""
+        for shape in self.collision.query(x, z, PLAYER_RADIUS):
+            if shape.top > self.y + STEP_HEIGHT and shape.bottom < self.y + self.height:
+                return True
+        return False
+    
+    def ground_height(self):
+        """Highest ground under the player: terrain, sea or something to stand on"""
+        ground = max(self.heightmap.height_at(self.x, self.z), SEA_LEVEL)
+        for shape in self.collision.query(self.x, self.z, 0):
+            if ground < shape.top <= self.y + STEP_HEIGHT:
+                ground = shape.top
+        return ground
+
+
+def percentile(values, fraction):
+    """Value below which the given fraction of sorted values fall"""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class QualityGovernor(Entity):
+    """Steps quality tiers up or down to hold the target frame time"""
+    
+    def __init__(self, sun, lod, props):
+        super().__init__()
+        self.sun = sun
+        self.lod = lod
+        self.props = props
+        self.frame_times = []
+        self.window_time = 0
+        self.slow_windows = 0
+        self.fast_windows = 0
+        
+        # Lower render scales draw the scene into a smaller buffer shown on a card
+        self.render_scale = 1
+        self.scaled_buffer = None
+        self.scaled_camera = None
+        self.scaled_card = None
+        
+        self.tier = QUALITY_START_TIER
+        self.apply(QUALITY_TIERS[self.tier])
+    
+    def update(self):
+        """Collect frame times and judge them once per window"""
+        self.frame_times.append(time.dt)
+        self.window_time += time.dt
+        if self.window_time < QUALITY_WINDOW:
+            return
+        
+        times = sorted(self.frame_times)
+        self.frame_times = []
+        self.window_time = 0
+        p50, p95, p99 = (percentile(times, f) for f in (0.5, 0.95, 0.99))
+        
+        # Separate thresholds and streaks give hysteresis between tiers
+        if p95 > TARGET_FRAME_TIME * 1.1:
+            self.slow_windows += 1
+            self.fast_windows = 0
+        elif p95 < TARGET_FRAME_TIME * 0.75:
+            self.fast_windows += 1
+            self.slow_windows = 0
+        else:
+            self.slow_windows = 0
+            self.fast_windows = 0
+        
+        if self.slow_windows >= QUALITY_DOWN_AFTER and self.tier < len(QUALITY_TIERS) - 1:
+            self.change_tier(self.tier + 1, p50, p95, p99)
+        elif self.fast_windows >= QUALITY_UP_AFTER and self.tier > 0:
+            self.change_tier(self.tier - 1, p50, p95, p99)
+    
+    def change_tier(self, tier, p50, p95, p99):
+        old = QUALITY_TIERS[self.tier]['name']
+        self.tier = tier
+        self.slow_windows = 0
+        self.fast_windows = 0
+        self.apply(QUALITY_TIERS[tier])
+        print(f"Quality: {old} -> {QUALITY_TIERS[tier]['name']} "
+              f"(frame time p50 {p50 * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms)")
+    
+    def apply(self, settings):
+        """Push a tier's settings to the sun, LOD manager, props and camera"""
+        self.sun.shadow_map_resolution = Vec2(settings['shadow_map'], settings['shadow_map'])
+        self.sun.shadows = settings['shadows']
+        self.lod.bias = settings['lod_bias']
+        self.props.set_density(settings['prop_density'])
+        self.set_render_scale(settings['render_scale'])
+    
+    def set_render_scale(self, scale):
+        if scale == self.render_scale:
+            return
+        self.render_scale = scale
+        
+        if self.scaled_buffer:
+            destroy(self.scaled_card)
+            self.scaled_camera.removeNode()
+            application.base.graphicsEngine.removeWindow(self.scaled_buffer)
+            self.scaled_buffer = None
+        
+        if scale >= 1:
+            camera.display_region.set_active(True)
+            return
+        
+        # Render the 3D scene at a lower resolution and stretch it over the screen
+        width, height = int(window.size[0] * scale), int(window.size[1] * scale)
+        self.scaled_buffer = application.base.win.make_texture_buffer('scaled_scene', width, height)
+        self.scaled_buffer.set_clear_color(window.color)
+        self.scaled_camera = application.base.makeCamera(self.scaled_buffer, lens=camera.lens)
+        self.scaled_card = Entity(
+            parent=camera.ui,
+            model='quad',
+            texture=Texture(self.scaled_buffer.get_texture()),
+            scale=(camera.aspect_ratio, 1),
+            z=1  # Behind the rest of the UI
+        )
+        camera.display_region.set_active(False)
+
+
+class TreasureManager(Entity):
+    """Animates every treasure in one pass and finds the ones the player reaches"""
+    
+    def __init__(self, player, on_collect):
+        # The manager is also the shared parent of all treasures, so
+        # floating them is a single transform write
+        super().__init__()
+        self.player = player
+        self.on_collect = on_collect
+        self.treasures = []
+        self.grid = {}  # (cell x, cell z) -> treasures in that cell
+        self.time = 0
+    
+    def cell(self, x, z):
+        return (int(x // TREASURE_CELL_SIZE), int(z // TREASURE_CELL_SIZE))
+    
+    def add(self, treasure):
+        """Take over animation and collection checks for a treasure"""
+        treasure.parent = self
+        treasure.sparkle.parent = self
+        self.treasures.append(treasure)
+        self.grid.setdefault(self.cell(treasure.x, treasure.z), []).append(treasure)
+    
+    def remove(self, treasure):
+        self.treasures.remove(treasure)
+        self.grid[self.cell(treasure.x, treasure.z)].remove(treasure)
+    
+    def update(self):
+        """Animate all treasures, then check the cells around the player"""
+        self.time += time.dt
+        
+        # Float up and down together
+        self.y = math.sin(self.time * TREASURE_FLOAT_SPEED) * 0.2
+        
+        # Every treasure shares the same spin and sparkle pulse, so work them
+        # out once and write them straight to the nodes
+        heading = -self.time * TREASURE_ROTATION_SPEED  # rotation_y turns opposite to heading
+        sparkle_scale = 0.3 + math.sin(self.time * 2) * 0.1
+        for treasure in self.treasures:
+            treasure.setH(heading)
+            if treasure.sparkle.enabled:  # Unless it has dropped out with distance
+                treasure.sparkle.setScale(sparkle_scale)
+        
+        # Only treasures in the player's cell and its neighbours can be reached
+        player_x = self.player.x
+        player_z = self.player.z
+        cell_x, cell_z = self.cell(player_x, player_z)
+        collected = []
+        for dx in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                for treasure in self.grid.get((cell_x + dx, cell_z + dz), ()):
+                    if treasure.check_collection(player_x, player_z):
+                        collected.append(treasure)
+        
+        for treasure in collected:
+            self.remove(treasure)
+            self.on_collect(treasure)
+
+
 class Treasure(Entity):
     """Treasure chest entity"""
     
@@ -269,11 +1340,6 @@ class Treasure(Entity):
             collider='box'
         )
         
-        self.original_y = position[1]
-        self.rotation_speed = 50
-        self.float_speed = 1
-        self.time = 0
-        
         # Add sparkle on top
         self.sparkle = Entity(
             model='sphere',
@@ -282,25 +1348,11 @@ class Treasure(Entity):
             scale=0.3
         )
     
-    def update(self):
-        """Animate treasure (rotate and float)"""
-        self.time += time.dt
-        
-        # Rotate
-        self.rotation_y += self.rotation_speed * time.dt
-        
-        # Float up and down
-        self.y = self.original_y + math.sin(self.time * self.float_speed) * 0.2
-        
-        # Update sparkle position
-        if self.sparkle:
-            self.sparkle.position = (self.x, self.y + 0.5, self.z)
-            self.sparkle.scale = 0.3 + math.sin(self.time * 2) * 0.1
-    
-    def check_collection(self, player_pos):
+    def check_collection(self, player_x, player_z):
         """Check if player is close enough to collect"""
-        distance = Vec3(player_pos.x - self.x, 0, player_pos.z - self.z).length()
-        return distance < 2
+        dx = player_x - self.x
+        dz = player_z - self.z
+        return dx * dx + dz * dz < TREASURE_COLLECT_DISTANCE ** 2
     
     def collect(self):
         """Collect the treasure"""
@@ -317,8 +1369,9 @@ class Treasure(Entity):
 
 def main():
     """Main function"""
+    app = Ursina(title="Pirate Island Explorer 3D", borderless=False, fullscreen=False)
     game = PirateIslandGame()
-    game.run()
+    app.run()
 
 
 if __name__ == '__main__':